@@ -0,0 +1,238 @@
+# This script runs the folds of a 'run(fold)' function in parallel.
+
+# The training scripts of this folder all have a 'run(fold)' function that
+# trains and validates one fold, and used to call it for the 5 folds one
+# after the other. Here every fold is a task for a pool of worker processes,
+# and the scores that 'run' returns are collected and summarized (mean and
+# standard deviation).
+
+# Repeated k-fold: the folds are created again for every repeat (stratified
+# on the target, with a different seed) and passed to 'run' as 'kfold',
+# an array with the fold of every row that replaces the 'kfold' column.
+
+# Nested cross-validation: for every outer fold, every set of parameters in
+# a grid is scored with the other folds (inner folds), the best one is
+# retrained on all of them and validated on the outer fold. For the inner
+# runs, the rows of the outer fold get the fold -1 in 'kfold', which means
+# that they are not used for training or for validation.
+
+# Models like random forests and xgboost use all the cores with n_jobs=-1.
+# With several folds at the same time this starts far more threads than
+# there are cores, which makes everything slower. So every worker gets
+# cores / workers threads: they are passed to 'run' as 'n_jobs', and the
+# thread pools of numpy and OpenMP in the worker are limited to the same.
+
+import os
+import json
+import inspect
+import argparse
+import itertools
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+import threadpoolctl
+from sklearn import model_selection
+
+import dataset_cache
+
+
+def argument_parser():
+    """
+    :return: ArgumentParser with the options of the runner, for the scripts
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--n_workers", type=int)
+    parser.add_argument("--model_n_jobs", type=int)
+
+    # with a parameter grid as json, for example '{"max_depth": [5, 7]}',
+    # nested cross-validation is used to choose the parameters
+    parser.add_argument("--param_grid", type=json.loads)
+    return parser
+
+
+def repeated_fold_ids(y, n_splits=5, n_repeats=5, seed=42):
+    """
+    Create stratified folds again for every repeat
+    :param y: numpy array of targets
+    :param n_splits: number of folds
+    :param n_repeats: number of repeats
+    :param seed: seed of the first repeat
+    :return: list with a numpy array of the fold of every row, per repeat
+    """
+    fold_sets = []
+    for repeat in range(n_repeats):
+        kf = model_selection.StratifiedKFold(
+            n_splits=n_splits, shuffle=True, random_state=seed + repeat)
+        kfold = np.empty(len(y), dtype=np.int8)
+        for fold, (_, valid_index) in enumerate(kf.split(np.zeros(len(y)), y)):
+            kfold[valid_index] = fold
+        fold_sets.append(kfold)
+    return fold_sets
+
+
+# thread limits of the current worker process, set by '_init_worker'.
+# a reference is kept, because the limits are removed when it is deleted
+_worker_limits = None
+
+
+def _init_worker(threads):
+    """
+    Limit the threads of numpy and OpenMP in a worker process
+    """
+    global _worker_limits
+    _worker_limits = threadpoolctl.threadpool_limits(threads)
+
+
+def _call(run, fold, kfold, n_jobs, params):
+    """
+    Call 'run' with the arguments that it accepts
+    """
+    accepted = inspect.signature(run).parameters
+    name = getattr(run, "__qualname__", repr(run))
+
+    # folds and parameters change the result, so a 'run' that cannot
+    # take them is an error. 'n_jobs' is only passed if it is accepted
+    kwargs = {}
+    if kfold is not None:
+        if "kfold" not in accepted:
+            raise TypeError(f"{name} has no 'kfold' argument, it cannot run repeated or nested folds")
+        kwargs["kfold"] = kfold
+    if params:
+        if "params" not in accepted:
+            raise TypeError(f"{name} has no 'params' argument, it cannot run a parameter grid")
+        if "n_jobs" in params and "n_jobs" in accepted:
+            raise ValueError("'n_jobs' is set by the runner, use --model_n_jobs instead of the parameter grid")
+        kwargs["params"] = params
+    if "n_jobs" in accepted:
+        kwargs["n_jobs"] = n_jobs
+    return run(fold, **kwargs)
+
+
+def _run_tasks(run, tasks, n_workers=None, model_n_jobs=None):
+    """
+    Run (fold, kfold, params) tasks in a pool of worker processes
+    :return: list of the scores of the tasks, in the same order
+    """
+    cores = os.cpu_count() or 1
+    n_workers = min(n_workers or cores, len(tasks))
+    threads = model_n_jobs or max(1, cores // n_workers)
+
+    with concurrent.futures.ProcessPoolExecutor(
+            n_workers, initializer=_init_worker, initargs=(threads,)) as executor:
+        futures = [
+            executor.submit(_call, run, fold, kfold, threads, params)
+            for fold, kfold, params in tasks
+        ]
+        return [future.result() for future in futures]
+
+
+def summarize(scores):
+    """
+    :param scores: DataFrame with a 'score' column
+    :return: tuple of (mean, standard deviation) of the scores
+    """
+    std = scores.score.std(ddof=1) if len(scores) > 1 else 0.0
+    return scores.score.mean(), std
+
+
+def repeated_cv(run, n_splits=5, n_repeats=1, y=None, seed=42, n_workers=None,
+                model_n_jobs=None):
+    """
+    Run all folds of all repeats in parallel
+    :param run: function that trains one fold and returns its score
+    :param n_splits: number of folds
+    :param n_repeats: number of repeats. with 1, the folds of the
+                      'kfold' column of the data are used
+    :param y: numpy array of targets, needed for more than one repeat
+    :param seed: seed of the folds of the first repeat
+    :param n_workers: number of worker processes, default is all cores
+    :param model_n_jobs: threads of every model, default is cores / workers
+    :return: DataFrame with the repeat, fold and score of every run
+    """
+    if n_repeats == 1:
+        fold_sets = [None]
+    elif y is None:
+        raise ValueError("The targets are needed to create the folds of the repeats")
+    else:
+        fold_sets = repeated_fold_ids(y, n_splits, n_repeats, seed)
+
+    keys = list(itertools.product(range(len(fold_sets)), range(n_splits)))
+    tasks = [(fold, fold_sets[repeat], None) for repeat, fold in keys]
+    scores = pd.DataFrame(keys, columns=["repeat", "fold"])
+    scores["score"] = _run_tasks(run, tasks, n_workers, model_n_jobs)
+
+    mean, std = summarize(scores)
+    print(f"Mean = {mean}, Std = {std} ({len(scores)} runs)")
+    return scores
+
+
+def nested_cv(run, kfold, param_grid, n_workers=None, model_n_jobs=None):
+    """
+    Choose the parameters of a model with nested cross-validation
+    :param run: function that trains one fold with 'params' and returns its score
+    :param kfold: numpy array with the fold of every row
+    :param param_grid: dictionary of parameter name: list of values
+    :param n_workers: number of worker processes, default is all cores
+    :param model_n_jobs: threads of every model, default is cores / workers
+    :return: DataFrame with the outer fold, best parameters and score
+    """
+    kfold = np.asarray(kfold)
+    folds = np.unique(kfold[kfold >= 0]).tolist()
+    candidates = list(model_selection.ParameterGrid(param_grid))
+
+    # the inner runs of all outer folds and parameters are run together
+    inner_keys, inner_tasks = [], []
+    for outer in folds:
+        inner_kfold = np.where(kfold == outer, -1, kfold).astype(np.int8)
+        for i, params in enumerate(candidates):
+            for inner in folds:
+                if inner != outer:
+                    inner_keys.append((outer, i))
+                    inner_tasks.append((inner, inner_kfold, params))
+
+    inner_scores = pd.DataFrame(inner_keys, columns=["outer", "candidate"])
+    inner_scores["score"] = _run_tasks(run, inner_tasks, n_workers, model_n_jobs)
+    best = inner_scores.groupby(["outer", "candidate"]).score.mean().groupby("outer").idxmax()
+
+    # validate the best parameters of every outer fold on that fold
+    outer_tasks = [(outer, kfold, candidates[best[outer][1]]) for outer in folds]
+    scores = pd.DataFrame({
+        "fold": folds,
+        "params": [params for _, _, params in outer_tasks],
+    })
+    scores["score"] = _run_tasks(run, outer_tasks, n_workers, model_n_jobs)
+
+    mean, std = summarize(scores)
+    print(f"Mean = {mean}, Std = {std} (nested, {len(candidates)} parameter sets)")
+    return scores
+
+
+def main(run, target_file, target_column, n_splits=5):
+    """
+    Run the cross-validation of a training script with the options of 'argument_parser'
+    :param run: function that trains one fold and returns its score
+    :param target_file: csv file with the data and the 'kfold' column
+    :param target_column: name of the target column
+    :param n_splits: number of folds
+    :return: DataFrame of scores
+    """
+    args = argument_parser().parse_args()
+
+    # build the cache of the data here, before the workers start. otherwise
+    # on the first run every worker parses the csv file to build it
+    dataset_cache.load_meta(target_file)
+
+    if args.param_grid:
+        kfold = np.array(dataset_cache.load_columns(target_file, ["kfold"])["kfold"])
+        return nested_cv(run, kfold, args.param_grid, args.n_workers, args.model_n_jobs)
+
+    y = None
+    if args.repeats > 1:
+        # text targets are cached as integer codes, which stratify the same way
+        y = dataset_cache.load_columns(target_file, [target_column])[target_column]
+        y = np.array(y[0] if isinstance(y, tuple) else y)
+    return repeated_cv(
+        run, n_splits=n_splits, n_repeats=args.repeats, y=y,
+        n_workers=args.n_workers, model_n_jobs=args.model_n_jobs)
@@ -1,55 +1,74 @@
 # This script implements a Random Forest model with 
 # Label Encoding on the 'cat-in-the-dat-ii' dataset
 
-import pandas as pd
+import dataset_cache
+import cv_runner
+import instrument
 
 from sklearn import metrics
 from sklearn import ensemble
 from sklearn import preprocessing
 
-def run(fold):
+def run(fold, kfold=None, n_jobs=-1, params=None):
 
-    # read dataset
-    df = pd.read_csv("../input/cat_train_folds.csv")
+    # measure every stage when AAMLP_PROFILE is set
+    profiler = instrument.Profiler("lbl_rf", fold=fold)
+
+    with profiler.stage("load"):
+        # read dataset
+        df = dataset_cache.read_csv("../input/cat_train_folds.csv")
+
+    # folds of a repeat or of nested cross-validation (see 'cv_runner.py').
+    # rows with the fold -1 are not used for training or validation
+    if kfold is not None:
+        df["kfold"] = kfold
 
     # all columns except for 'id', 'target', and 'kfold' are features
     features = [x for x in df.columns if x not in ["id", "target", "kfold"]]
 
-    # fill all NaN values with NONE and convert all columns to type 'str'
-    for col in features:
-        df.loc[:, col] = df[col].astype(str).fillna("NONE")
+    with profiler.stage("encode"):
+        # fill all NaN values with NONE and convert all columns to type 'str'
+        for col in features:
+            df.loc[:, col] = df[col].astype(str).fillna("NONE")
 
-    for col in features:
-        lbl = preprocessing.LabelEncoder()
-        lbl.fit(df[col])
-        df.loc[:, col] = lbl.transform(df[col])
+        for col in features:
+            lbl = preprocessing.LabelEncoder()
+            lbl.fit(df[col])
+            df.loc[:, col] = lbl.transform(df[col])
 
-    # get training and validation data using folds
-    df_train = df[df.kfold != fold].reset_index(drop=True)
-    df_valid = df[df.kfold == fold].reset_index(drop=True)
+    with profiler.stage("split"):
+        # get training and validation data using folds
+        df_train = df[(df.kfold != fold) & (df.kfold >= 0)].reset_index(drop=True)
+        df_valid = df[df.kfold == fold].reset_index(drop=True)
 
-    # get training and validation data
-    x_train = df_train[features].values
-    x_valid = df_valid[features].values
+        # get training and validation data
+        x_train = df_train[features].values
+        x_valid = df_valid[features].values
 
     # initialize a random forest model
-    model = ensemble.RandomForestClassifier(n_jobs=-1)
+    model = ensemble.RandomForestClassifier(**{**(params or {}), "n_jobs": n_jobs})
 
-    # train model (fit model on training data)
-    model.fit(x_train, df_train.target.values)
+    with profiler.stage("fit"):
+        # train model (fit model on training data)
+        model.fit(x_train, df_train.target.values)
 
-    # perform predictions on the validation data. the predict_proba()
-    # method will return a (120000, 2) tensor, with the first column
-    # containing the probabilites that the samples are of class 0, and
-    # the second column containing the probabilities that they are of class 1.
-    # we will use the probability of 1s
-    valid_preds = model.predict_proba(x_valid)[:, 1]
+    with profiler.stage("predict"):
+        # perform predictions on the validation data. the predict_proba()
+        # method will return a (120000, 2) tensor, with the first column
+        # containing the probabilites that the samples are of class 0, and
+        # the second column containing the probabilities that they are of class 1.
+        # we will use the probability of 1s
+        valid_preds = model.predict_proba(x_valid)[:, 1]
 
-    # get ROC AUC score
-    auc = metrics.roc_auc_score(df_valid.target.values, valid_preds)
+    with profiler.stage("metric"):
+        # get ROC AUC score
+        auc = metrics.roc_auc_score(df_valid.target.values, valid_preds)
 
     print(f"Fold = {fold}, AUC = {auc}")
+    return auc
 
 if __name__ == "__main__":
-    for fold_ in range(5):
-        run(fold_)
+    # run the folds in parallel and print the mean and std of the AUC.
+    # use --repeats for repeated k-fold and --param_grid for nested
+    # cross-validation (see 'cv_runner.py')
+    cv_runner.main(run, "../input/cat_train_folds.csv", "target")
@@ -5,56 +5,77 @@ import pandas as pd
 import xgboost as xgb
 from sklearn import metrics, preprocessing
 
-def run(fold):
+import cv_runner
+import instrument
+
+def run(fold, kfold=None, n_jobs=-1, params=None):
+
+    # measure every stage when AAMLP_PROFILE is set
+    profiler = instrument.Profiler("lbl_xgb", fold=fold)
     
-    # read dataset
-    df = pd.read_csv("../input/cat_train_folds.csv")
+    with profiler.stage("load"):
+        # read dataset
+        df = pd.read_csv("../input/cat_train_folds.csv")
+
+    # folds of a repeat or of nested cross-validation (see 'cv_runner.py').
+    # rows with the fold -1 are not used for training or validation
+    if kfold is not None:
+        df["kfold"] = kfold
 
     # all columns except for 'id', 'target', and 'kfold' are features
     features = [x for x in df.columns if x not in ["id", "target", "kfold"]]
 
-    # fill all NaN values with NONE and convert all columns to type 'str'
-    for col in features:
-        df[col] = df[col].astype(str).fillna("NONE")
+    with profiler.stage("encode"):
+        # fill all NaN values with NONE and convert all columns to type 'str'
+        for col in features:
+            df[col] = df[col].astype(str).fillna("NONE")
 
-    # label encode the features
-    for col in features:
+        # label encode the features
+        for col in features:
 
-        # initialize LabelEncoder for each feature column
-        lbl = preprocessing.LabelEncoder()
+            # initialize LabelEncoder for each feature column
+            lbl = preprocessing.LabelEncoder()
 
-        # fit LabelEncoder on all data
-        lbl.fit(df[col])
+            # fit LabelEncoder on all data
+            lbl.fit(df[col])
 
-        # transform all the data
-        df[col] = lbl.transform(df[col])
+            # transform all the data
+            df[col] = lbl.transform(df[col])
 
-    # get training and validation data using folds
-    df_train = df[df.kfold != fold].reset_index(drop=True)
-    df_valid = df[df.kfold == fold].reset_index(drop=True)
+    with profiler.stage("split"):
+        # get training and validation data using folds
+        df_train = df[(df.kfold != fold) & (df.kfold >= 0)].reset_index(drop=True)
+        df_valid = df[df.kfold == fold].reset_index(drop=True)
 
-    # get training and validation data
-    x_train = df_train[features].values
-    x_valid = df_valid[features].values
+        # get training and validation data
+        x_train = df_train[features].values
+        x_valid = df_valid[features].values
 
     # initialize xgboost model
-    model = xgb.XGBClassifier(
-        n_jobs=-1,
-        max_depth=7,
-        n_estimators=200
-    )
+    model = xgb.XGBClassifier(**{
+        "n_jobs": n_jobs,
+        "max_depth": 7,
+        "n_estimators": 200,
+        **(params or {}),
+    })
 
-    # fit model on training data (ohe)
-    model.fit(x_train, df_train.target.values)
+    with profiler.stage("fit"):
+        # fit model on training data (ohe)
+        model.fit(x_train, df_train.target.values)
 
-    # perform predictions on validation data
-    valid_preds = model.predict_proba(x_valid)[:, 1]
+    with profiler.stage("predict"):
+        # perform predictions on validation data
+        valid_preds = model.predict_proba(x_valid)[:, 1]
 
-    # get ROC AUC score
-    auc = metrics.roc_auc_score(df_valid.target.values, valid_preds)
+    with profiler.stage("metric"):
+        # get ROC AUC score
+        auc = metrics.roc_auc_score(df_valid.target.values, valid_preds)
 
     print(f"Fold = {fold}, AUC = {auc}")
+    return auc
 
 if __name__ == "__main__":
-    for fold_ in range(5):
-        run(fold_)
\ No newline at end of file
+    # run the folds in parallel and print the mean and std of the AUC.
+    # use --repeats for repeated k-fold and --param_grid for nested
+    # cross-validation (see 'cv_runner.py')
+    cv_runner.main(run, "../input/cat_train_folds.csv", "target")
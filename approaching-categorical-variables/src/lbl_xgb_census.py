@@ -1,73 +1,94 @@
 # This script implements an XGBoost model with Label Encoded
 # data on the US Adult Census dataset
 
-import pandas as pd
 import xgboost as xgb
 
+import dataset_cache
+import cv_runner
+import instrument
+
 from sklearn import preprocessing
 from sklearn import metrics
 
-def run(fold):
-
-    # read the input dataset
-    df = pd.read_csv("../input/adult_folds.csv")
-
-    # list columns that will be dropped
-    num_columns = [
-        "fnlwgt",
-        "age",
-        "capital.gain",
-        "capital.loss",
-        "hours.per.week"
-    ]
-
-    # drop listed columns from DataFrame
-    df = df.drop(num_columns, axis=1)
-
-    # create dictionary to map binary 
-    # 'income' labels to 0 and 1
-    income_mapping = {
-        "<=50K": 0,
-        ">50K": 1
-    }
+def run(fold, kfold=None, n_jobs=-1, params=None):
+
+    # measure every stage when AAMLP_PROFILE is set
+    profiler = instrument.Profiler("lbl_xgb_census", fold=fold)
+
+    with profiler.stage("load"):
+        # read the input dataset
+        df = dataset_cache.read_csv("../input/adult_folds.csv")
+
+    # folds of a repeat or of nested cross-validation (see 'cv_runner.py').
+    # rows with the fold -1 are not used for training or validation
+    if kfold is not None:
+        df["kfold"] = kfold
+
+    with profiler.stage("encode"):
+        # list columns that will be dropped
+        num_columns = [
+            "fnlwgt",
+            "age",
+            "capital.gain",
+            "capital.loss",
+            "hours.per.week"
+        ]
+
+        # drop listed columns from DataFrame
+        df = df.drop(num_columns, axis=1)
+
+        # create dictionary to map binary 
+        # 'income' labels to 0 and 1
+        income_mapping = {
+            "<=50K": 0,
+            ">50K": 1
+        }
     
-    # map labels to 0 and 1
-    df["income"] = df.income.map(income_mapping)
+        # map labels to 0 and 1
+        df["income"] = df.income.map(income_mapping)
 
-    features = [x for x in df.columns if x not in ["kfold", "income"]]
+        features = [x for x in df.columns if x not in ["kfold", "income"]]
 
-    # convert all data to type 'str'
-    for feature in features:
-        df[feature] = df[feature].astype(str).fillna("NONE")
+        # convert all data to type 'str'
+        for feature in features:
+            df[feature] = df[feature].astype(str).fillna("NONE")
 
-    # perform Label Encoding on all columns, except 'income' and 'kfold'
-    for feature in features:
-        lbl = preprocessing.LabelEncoder()
-        df[feature] = lbl.fit_transform(df[feature])
+        # perform Label Encoding on all columns, except 'income' and 'kfold'
+        for feature in features:
+            lbl = preprocessing.LabelEncoder()
+            df[feature] = lbl.fit_transform(df[feature])
 
-    # get training and validation data from folds
-    df_train = df[df.kfold != fold].reset_index(drop=True)
-    df_valid = df[df.kfold == fold].reset_index(drop=True)
+    with profiler.stage("split"):
+        # get training and validation data from folds
+        df_train = df[(df.kfold != fold) & (df.kfold >= 0)].reset_index(drop=True)
+        df_valid = df[df.kfold == fold].reset_index(drop=True)
 
     # intialize XGBoost model
-    model = xgb.XGBClassifier(
-        n_jobs=-1,
-        max_depth=7,
-        n_estimators=200
-    )
+    model = xgb.XGBClassifier(**{
+        "n_jobs": n_jobs,
+        "max_depth": 7,
+        "n_estimators": 200,
+        **(params or {}),
+    })
 
-    # train model
-    model.fit(df_train[features].values, df_train.income.values)
+    with profiler.stage("fit"):
+        # train model
+        model.fit(df_train[features].values, df_train.income.values)
 
-    # use trained model to generate predictions on validation data
-    predictions = model.predict_proba(df_valid[features].values)[:, 1]
+    with profiler.stage("predict"):
+        # use trained model to generate predictions on validation data
+        predictions = model.predict_proba(df_valid[features].values)[:, 1]
 
-    # calculate ROC AUC metric
-    auc = metrics.roc_auc_score(df_valid.income.values, predictions)
+    with profiler.stage("metric"):
+        # calculate ROC AUC metric
+        auc = metrics.roc_auc_score(df_valid.income.values, predictions)
 
     print(f"Fold = {fold}, AUC = {auc}")
+    return auc
 
 
 if __name__ == "__main__":
-    for i in range(5):
-        run(i)
\ No newline at end of file
+    # run the folds in parallel and print the mean and std of the AUC.
+    # use --repeats for repeated k-fold and --param_grid for nested
+    # cross-validation (see 'cv_runner.py')
+    cv_runner.main(run, "../input/adult_folds.csv", "income")
@@ -6,64 +6,85 @@ import pandas as pd
 from scipy import sparse
 from sklearn import ensemble, metrics, preprocessing, decomposition
 
-def run(fold):
+import cv_runner
+import instrument
+
+def run(fold, kfold=None, n_jobs=-1, params=None):
+
+    # measure every stage when AAMLP_PROFILE is set
+    profiler = instrument.Profiler("ohe_svd_rf", fold=fold)
     
-    # read dataset
-    df = pd.read_csv("../input/cat_train_folds.csv")
+    with profiler.stage("load"):
+        # read dataset
+        df = pd.read_csv("../input/cat_train_folds.csv")
+
+    # folds of a repeat or of nested cross-validation (see 'cv_runner.py').
+    # rows with the fold -1 are not used for training or validation
+    if kfold is not None:
+        df["kfold"] = kfold
 
     # all columns except for 'id', 'target', and 'kfold' are features
     features = [x for x in df.columns if x not in ["id", "target", "kfold"]]
 
-    # fill all NaN values with NONE and convert all columns to type 'str'
-    for col in features:
-        df[col] = df[col].astype(str).fillna("NONE")
+    with profiler.stage("encode"):
+        # fill all NaN values with NONE and convert all columns to type 'str'
+        for col in features:
+            df[col] = df[col].astype(str).fillna("NONE")
 
-    # get training and validation data using folds
-    df_train = df[df.kfold != fold].reset_index(drop=True)
-    df_valid = df[df.kfold == fold].reset_index(drop=True)
+    with profiler.stage("split"):
+        # get training and validation data using folds
+        df_train = df[(df.kfold != fold) & (df.kfold >= 0)].reset_index(drop=True)
+        df_valid = df[df.kfold == fold].reset_index(drop=True)
 
-    # initialize OneHotEncoder from scikit-learn.
-    # by default, 'sparse' is set to True
-    ohe = preprocessing.OneHotEncoder()
+    with profiler.stage("encode_svd"):
+        # initialize OneHotEncoder from scikit-learn.
+        # by default, 'sparse' is set to True
+        ohe = preprocessing.OneHotEncoder()
 
-    # fit ohe on training + validation features
-    x_train = df_train[features]
-    x_valid = df_valid[features]
-    full_data = pd.concat([x_train, x_valid], axis=0)
-    ohe.fit(full_data)
+        # fit ohe on training + validation features
+        x_train = df_train[features]
+        x_valid = df_valid[features]
+        full_data = pd.concat([x_train, x_valid], axis=0)
+        ohe.fit(full_data)
 
-    # transform training and validation data
-    x_train = ohe.transform(x_train)
-    x_valid = ohe.transform(x_valid)
+        # transform training and validation data
+        x_train = ohe.transform(x_train)
+        x_valid = ohe.transform(x_valid)
 
-    # initialize Truncated SVD. here, we
-    # choose to reduce the data to 120 components
-    svd = decomposition.TruncatedSVD(n_components=120)
+        # initialize Truncated SVD. here, we
+        # choose to reduce the data to 120 components
+        svd = decomposition.TruncatedSVD(n_components=120)
 
-    # fit SVD on full sparse training data
-    full_sparse = sparse.vstack((x_train, x_valid))
-    svd.fit(full_sparse)
+        # fit SVD on full sparse training data
+        full_sparse = sparse.vstack((x_train, x_valid))
+        svd.fit(full_sparse)
 
-    # transform sparse training data
-    x_train = svd.transform(x_train)
-    x_valid = svd.transform(x_valid)
+        # transform sparse training data
+        x_train = svd.transform(x_train)
+        x_valid = svd.transform(x_valid)
 
     # initialize the random forest model. 'n_jobs' sets
     # the number of jobs to run in parallel. 
     # 'n_jobs = -1' means using all processors
-    model = ensemble.RandomForestClassifier(n_jobs=-1)
+    model = ensemble.RandomForestClassifier(**{**(params or {}), "n_jobs": n_jobs})
 
-    # fit model on training data (ohe)
-    model.fit(x_train, df_train.target.values)
+    with profiler.stage("fit"):
+        # fit model on training data (ohe)
+        model.fit(x_train, df_train.target.values)
 
-    # perform predictions on validation data
-    valid_preds = model.predict_proba(x_valid)[:, 1]
+    with profiler.stage("predict"):
+        # perform predictions on validation data
+        valid_preds = model.predict_proba(x_valid)[:, 1]
 
-    # get ROC AUC score
-    auc = metrics.roc_auc_score(df_valid.target.values, valid_preds)
+    with profiler.stage("metric"):
+        # get ROC AUC score
+        auc = metrics.roc_auc_score(df_valid.target.values, valid_preds)
 
     print(f"Fold = {fold}, AUC = {auc}")
+    return auc
 
 if __name__ == "__main__":
-    for fold_ in range(5):
-        run(fold_)
\ No newline at end of file
+    # run the folds in parallel and print the mean and std of the AUC.
+    # use --repeats for repeated k-fold and --param_grid for nested
+    # cross-validation (see 'cv_runner.py')
+    cv_runner.main(run, "../input/cat_train_folds.csv", "target")
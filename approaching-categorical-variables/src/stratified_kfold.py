@@ -1,39 +1,147 @@
 # This script implements Stratified KFold to
 # binary classification problems with skewed datasets
 
+# With --stream the dataset is never loaded in memory, so it works for
+# files of any size. It reads the file two times, one chunk at a time:
+#   1. count the rows of every class of the target column
+#   2. give every row a fold. the rows of every class take the folds in
+#      turns (round-robin): every block of n_splits rows of a class gets
+#      each fold once, in a random order from a seeded generator. so every
+#      fold gets the same share of every class, like StratifiedKFold, and
+#      the same seed always gives the same folds
+# The rows keep their order in the output file, which is written in chunks.
+# Only the counts and a few fold ids per class are kept between chunks.
+
+# Example:
+#   python stratified_kfold.py --input_dataset ../input/adult.csv --output_dataset ../input/adult_folds.csv --stream
+
 import argparse
+
+import numpy as np
 import pandas as pd
 from sklearn import model_selection
 
+
+def count_classes(input_data, target, chunksize=1_000_000):
+    """
+    First pass: count the rows of every class
+    :param input_data: path of the csv file
+    :param target: name of the target column
+    :param chunksize: number of rows read at a time
+    :return: pandas Series of class: number of rows, sorted by class
+    """
+    counts = None
+    for chunk in pd.read_csv(input_data, usecols=[target], chunksize=chunksize):
+        chunk_counts = chunk[target].value_counts(dropna=False)
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    return counts.astype(np.int64).sort_index()
+
+
+class _ClassFolds:
+    """
+    Hands out the folds of the rows of one class, in blocks of
+    n_splits folds that are each shuffled with the class generator
+    """
+
+    def __init__(self, n_splits, seed_sequence):
+        self.n_splits = n_splits
+        self.rng = np.random.default_rng(seed_sequence)
+        self.pending = np.empty(0, dtype=np.int8)
+
+    def take(self, n_rows):
+        """
+        :param n_rows: number of rows of the class in the current chunk
+        :return: numpy array with the fold of each of these rows
+        """
+        missing = n_rows - len(self.pending)
+        if missing > 0:
+            # sorting random keys shuffles every block. the generator is
+            # used the same way for any chunk size, so the folds do not
+            # depend on the chunk size
+            n_blocks = -(-missing // self.n_splits)
+            keys = self.rng.random((n_blocks, self.n_splits))
+            blocks = np.argsort(keys, axis=1).astype(np.int8).ravel()
+            self.pending = np.concatenate((self.pending, blocks))
+
+        folds, self.pending = self.pending[:n_rows], self.pending[n_rows:]
+        return folds
+
+
+def stream_stratified_folds(input_data, output_data, target="income", n_splits=5, seed=42,
+                            chunksize=1_000_000):
+    """
+    Add a stratified 'kfold' column to a csv file without loading it
+    :param input_data: path of the csv file
+    :param output_data: path of the new csv file
+    :param target: name of the target column
+    :param n_splits: number of folds
+    :param seed: seed of the random generators
+    :param chunksize: number of rows read and written at a time
+    :return: pandas DataFrame with the number of rows of every class in every fold
+    """
+    counts = count_classes(input_data, target, chunksize)
+    classes = counts.index
+
+    # one generator per class, in the order of the sorted classes
+    seeds = np.random.SeedSequence(seed).spawn(len(classes))
+    class_folds = [_ClassFolds(n_splits, s) for s in seeds]
+
+    fold_counts = np.zeros((len(classes), n_splits), dtype=np.int64)
+    with open(output_data, "w", newline="") as f:
+        for i, chunk in enumerate(pd.read_csv(input_data, chunksize=chunksize)):
+            codes = classes.get_indexer(chunk[target])
+            kfold = np.empty(len(chunk), dtype=np.int8)
+            for code in np.unique(codes):
+                rows = np.flatnonzero(codes == code)
+                kfold[rows] = class_folds[code].take(len(rows))
+            fold_counts += np.bincount(
+                codes * n_splits + kfold, minlength=fold_counts.size).reshape(fold_counts.shape)
+
+            chunk["kfold"] = kfold
+            chunk.to_csv(f, header=i == 0, index=False)
+
+    return pd.DataFrame(fold_counts, index=classes, columns=range(n_splits))
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--input_dataset', type=str)
     parser.add_argument('--output_dataset', type=str)
+    parser.add_argument('--target', type=str, default="income")
+    parser.add_argument('--n_splits', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stream', action="store_true")
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
     args = parser.parse_args()
 
     input_data = args.input_dataset
     output_data = args.output_dataset
 
-    # read the dataset
-    df = pd.read_csv(input_data)
+    if args.stream:
+        # two passes over the file, one chunk at a time
+        print(stream_stratified_folds(
+            input_data, output_data, target=args.target, n_splits=args.n_splits,
+            seed=args.seed, chunksize=args.chunksize))
+    else:
+        # read the dataset
+        df = pd.read_csv(input_data)
 
-    # create a 'kfold' column
-    df["kfold"] = -1
+        # create a 'kfold' column
+        df["kfold"] = -1
 
-    # randomize the rows
-    df = df.sample(frac=1).reset_index(drop=True)
+        # randomize the rows
+        df = df.sample(frac=1, random_state=args.seed).reset_index(drop=True)
 
-    # obtain the label values
-    y = df.income.values
+        # obtain the label values
+        y = df[args.target].values
 
-    # initialize a StratifiedKFold model
-    kf = model_selection.StratifiedKFold(n_splits=5)
+        # initialize a StratifiedKFold model
+        kf = model_selection.StratifiedKFold(n_splits=args.n_splits)
 
-    # fill the 'kfold' column
-    for fold, (trn_, val_) in enumerate(kf.split(X=df, y=y)):
-        df.loc[val_, 'kfold'] = fold
+        # fill the 'kfold' column
+        for fold, (trn_, val_) in enumerate(kf.split(X=df, y=y)):
+            df.loc[val_, 'kfold'] = fold
 
-    # save the new csv file 
-    df.to_csv(output_data, index=False)
-    
\ No newline at end of file
+        # save the new csv file
+        df.to_csv(output_data, index=False)
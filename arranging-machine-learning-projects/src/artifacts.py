@@ -0,0 +1,134 @@
+# This script saves and loads trained models.
+
+# Every model is saved as '<MODEL_OUTPUT>/<model name>/fold_<fold>.joblib',
+# together with a small 'fold_<fold>.json' file that describes it (model
+# name, fold, metrics, parameters, feature columns, classes, file size). All these
+# json files form the manifest, so we can find models by name, fold or
+# metric without loading any of them. Since every fold writes its own
+# json file, folds that are trained in parallel never write to the same file.
+
+# Models are saved without compression by default, which is the fastest
+# to write and to read. Compression makes the files smaller, but then the
+# arrays have to be decompressed when the model is loaded.
+# 'load_model' can memory-map the numpy arrays of uncompressed files with
+# mmap=True, but this does not help for sklearn trees: when a tree is
+# unpickled, it copies its node arrays into memory anyway, so loading a
+# forest with mmap=True is even a bit slower. It is off by default.
+
+import os
+import glob
+import json
+import time
+
+import joblib
+
+import config
+
+
+def _paths(model_name, fold, output_dir=None):
+    """
+    :return: tuple of (model file, json file) paths of a fold model
+    """
+    folder = os.path.join(output_dir or config.MODEL_OUTPUT, model_name)
+    return (
+        os.path.join(folder, f"fold_{fold}.joblib"),
+        os.path.join(folder, f"fold_{fold}.json"),
+    )
+
+
+def save_model(clf, model_name, fold, scores, features=None, compress=0, output_dir=None):
+    """
+    Save a trained model and its manifest entry
+    :param clf: trained model
+    :param model_name: name of the model in model_dispatcher
+    :param fold: fold that was used for validation
+    :param scores: dictionary of metric name: value
+    :param features: optional list of the feature columns, in order
+    :param compress: joblib compression level 0-9
+    :param output_dir: optional folder, default is config.MODEL_OUTPUT
+    :return: manifest entry of the model
+    """
+    model_path, entry_path = _paths(model_name, fold, output_dir)
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
+    joblib.dump(clf, model_path, compress=compress)
+
+    entry = {
+        "model": model_name,
+        "fold": int(fold),
+        "path": os.path.basename(model_path),
+        "scores": {name: float(value) for name, value in scores.items()},
+        "params": {k: repr(v) for k, v in clf.get_params().items()},
+        "features": features,
+        # classes of a classifier, so that they can be read without loading it
+        "classes": clf.classes_.tolist() if hasattr(clf, "classes_") else None,
+        "compress": compress,
+        "bytes": os.path.getsize(model_path),
+        "created": time.time(),
+    }
+
+    # write the json file last, so that an entry always points to a
+    # complete model file
+    tmp_path = entry_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp_path, entry_path)
+    return entry
+
+
+def load_manifest(model_name=None, output_dir=None):
+    """
+    Read the manifest entries of the saved models
+    :param model_name: optional name to only get the entries of one model
+    :param output_dir: optional folder, default is config.MODEL_OUTPUT
+    :return: list of entries sorted by model name and fold
+    """
+    pattern = os.path.join(output_dir or config.MODEL_OUTPUT, model_name or "*", "fold_*.json")
+    entries = []
+    for entry_path in glob.glob(pattern):
+        with open(entry_path) as f:
+            entries.append(json.load(f))
+    return sorted(entries, key=lambda e: (e["model"], e["fold"]))
+
+
+def best_entry(metric, model_name=None, output_dir=None, higher_is_better=True):
+    """
+    Find the saved model with the best score
+    :param metric: name of the metric, for example "accuracy"
+    :param model_name: optional name to only look at one model
+    :param output_dir: optional folder, default is config.MODEL_OUTPUT
+    :param higher_is_better: False for metrics like log loss
+    :return: manifest entry of the best model
+    """
+    entries = [
+        e for e in load_manifest(model_name, output_dir) if metric in e["scores"]
+    ]
+    choose = max if higher_is_better else min
+    return choose(entries, key=lambda e: e["scores"][metric])
+
+
+def load_model(model_name, fold, mmap=False, output_dir=None):
+    """
+    Load a saved model
+    :param model_name: name of the model
+    :param fold: fold of the model
+    :param mmap: memory-map the arrays of uncompressed models
+    :param output_dir: optional folder, default is config.MODEL_OUTPUT
+    :return: trained model
+    """
+    model_path, _ = _paths(model_name, fold, output_dir)
+    return joblib.load(model_path, mmap_mode="r" if mmap else None)
+
+
+def load_fold_models(model_name, mmap=False, output_dir=None):
+    """
+    Load the models of all folds of a model
+    :param model_name: name of the model
+    :param mmap: memory-map the arrays of uncompressed models
+    :param output_dir: optional folder, default is config.MODEL_OUTPUT
+    :return: dictionary of fold: trained model
+    """
+    return {
+        entry["fold"]: load_model(model_name, entry["fold"], mmap, output_dir)
+        for entry in load_manifest(model_name, output_dir)
+    }
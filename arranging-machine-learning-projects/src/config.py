@@ -1,4 +1,22 @@
 # Script containing configurations for the training script
 
-TRAINING_FILE = "../input/mnist_train_folds.csv"
-MODEL_OUTPUT = "../models/"
\ No newline at end of file
+# the raw training data. 'create_folds.py' saves the fold of every row
+# next to it, in 'mnist_train.csv.kfold.npy', and 'train.py' reads the
+# folds from there because this file has no 'kfold' column
+TRAINING_FILE = "../input/mnist_train.csv"
+MODEL_OUTPUT = "../models/"
+
+# columns of the training file that are not features: the target, the
+# fold, and the row index that was written by 'create_folds.py'. the
+# fold and the index do not exist in new data that we want to score
+NON_FEATURE_COLUMNS = ["label", "kfold", "Unnamed: 0"]
+
+# joblib compression level of the saved models (0-9). 0 is the
+# fastest to save and load, higher levels make smaller files
+MODEL_COMPRESS = 0
+
+# number of rows read at a time when training with 'train.py --stream',
+# and the folds that are trained when no fold is given. the folds are
+# not read from the file, so that the file is not read one extra time
+STREAM_CHUNKSIZE = 50_000
+STREAM_FOLDS = [0, 1, 2, 3, 4]
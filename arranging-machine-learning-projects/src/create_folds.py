@@ -1,27 +1,30 @@
 # This script performs k-fold on the dataset.
-# We are using 5 folds for this dataset 
+# We are using 5 folds for this dataset
 
-# Import necessary libraries
-import pandas as pd
-from sklearn import model_selection
+# The fold of every row is saved in a small 'mnist_train.csv.kfold.npy'
+# file next to the data (see 'fold_ids.py'). The rows are assigned to
+# the folds at random with a fixed seed, so running this script again
+# gives the same folds. By default the folds are created for
+# config.TRAINING_FILE, the file that 'train.py' loads, so that 'train.py'
+# finds them in this file.
 
-# read csv file containing training data
-df = pd.read_csv(
-    "/home/ahmad/dev/AAMLP_code/arranging-machine-learning-projects/input/mnist_train.csv")
+# Import necessary libraries
+import argparse
 
-# add new column 'kfold' and fill it with -1
-df['kfold'] = -1
+import config
+import fold_ids
 
-# Shuffle the rows and reset the indices
-df = df.sample(frac=1).reset_index(drop=True)
+if __name__ == "__main__":
 
-# initialize kfold model with 5 splits
-kf = model_selection.KFold(n_splits=5)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default=config.TRAINING_FILE)
+    parser.add_argument("--n_splits", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
 
-# Fill the new kfold column and split the data into 5 sections
-for fold, (trn_, val_) in enumerate(kf.split(X=df)):
-    df.loc[val_, 'kfold'] = fold
+    # optional copy of the data with a 'kfold' column, for example
+    # ../input/mnist_train_folds.csv. it is written in chunks
+    parser.add_argument("--output", type=str)
+    args = parser.parse_args()
 
-# Write the results into an output file 'mnist_train_folds.csv'
-df.to_csv(
-    "/home/ahmad/dev/AAMLP_code/arranging-machine-learning-projects/input/mnist_train_folds.csv")
+    fold_ids.create_folds(
+        args.input, n_splits=args.n_splits, seed=args.seed, output_file=args.output)
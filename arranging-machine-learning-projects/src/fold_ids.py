@@ -0,0 +1,181 @@
+# This script assigns every row of a csv file to a fold.
+
+# This file is copied into every folder that uses it, and the copies must
+# stay identical. Edit the copy in 'arranging-machine-learning-projects/src'
+# and run 'python check_shared_modules.py --sync' at the root of the repo.
+
+# Instead of shuffling the whole DataFrame, filling a 'kfold' column in a
+# loop and writing the full dataset again, we only need the number of rows
+# of the file. The fold ids are one small array with the same fold sizes
+# as sklearn's KFold, shuffled with a fixed seed, so the same seed always
+# gives the same folds. The ids are saved next to the csv file in a
+# '<file>.kfold.npy' sidecar file (1 byte per row), and the csv file is
+# never rewritten.
+
+# The rows are counted by reading the file in binary blocks, so files of
+# many GB never have to fit in memory. Only the fold ids are kept in memory.
+# Note: this counts lines, so text values with newlines inside quotes are
+# not supported.
+
+# Splits where the training rows are not simply all the other folds
+# (like the purged time series splits in 'cross-validation/time_series_split.py')
+# are saved as index arrays in a '<file>.splits.npz' file with 'save_splits'.
+
+# Example:
+#   python fold_ids.py --input ../input/mnist_train.csv --n_splits 5 --seed 42
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+def sidecar_path(path):
+    """
+    :param path: path of the csv file
+    :return: path of the fold id file of the csv file
+    """
+    return path + ".kfold.npy"
+
+
+def count_rows(path, block_size=1 << 24):
+    """
+    Count the data rows of a csv file with a header, reading it in blocks
+    :param path: path of the csv file
+    :param block_size: number of bytes read at a time
+    :return: number of rows without the header
+    """
+    n_lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            n_lines += block.count(b"\n")
+            last = block[-1:]
+
+    # the last line may not end with a newline
+    if last != b"\n":
+        n_lines += 1
+    return max(n_lines - 1, 0)
+
+
+def kfold_ids(n_rows, n_splits=5, seed=42):
+    """
+    Assign rows to folds at random, with the same fold sizes as KFold
+    :param n_rows: number of rows
+    :param n_splits: number of folds
+    :param seed: seed of the random generator
+    :return: numpy array with the fold of every row
+    """
+    # like KFold, the first n_rows % n_splits folds get one extra row
+    sizes = np.full(n_splits, n_rows // n_splits)
+    sizes[:n_rows % n_splits] += 1
+
+    dtype = np.int8 if n_splits <= np.iinfo(np.int8).max else np.int32
+    ids = np.repeat(np.arange(n_splits, dtype=dtype), sizes)
+
+    # shuffling the fold ids in place is the same as shuffling the rows
+    # and cutting them in n_splits parts, without touching the rows
+    np.random.default_rng(seed).shuffle(ids)
+    return ids
+
+
+def save(ids, path):
+    """
+    Save the fold ids of a csv file in its sidecar file
+    :param ids: numpy array with the fold of every row
+    :param path: path of the csv file
+    :return: path of the sidecar file
+    """
+    target = sidecar_path(path)
+    tmp_path = target + ".tmp.npy"
+    np.save(tmp_path, ids)
+    os.replace(tmp_path, target)
+    return target
+
+
+def load(path, mmap=True):
+    """
+    Load the fold ids of a csv file from its sidecar file
+    :param path: path of the csv file
+    :param mmap: memory-map the file instead of reading it
+    :return: numpy array with the fold of every row
+    """
+    return np.load(sidecar_path(path), mmap_mode="r" if mmap else None)
+
+
+def splits_path(path):
+    """
+    :param path: path of the csv file
+    :return: path of the split index file of the csv file
+    """
+    return path + ".splits.npz"
+
+
+def save_splits(splits, path):
+    """
+    Save the training and validation row indices of every fold
+    :param splits: list of (train_index, valid_index) numpy arrays
+    :param path: path of the csv file
+    :return: path of the split index file
+    """
+    arrays = {}
+    for fold, (train_index, valid_index) in enumerate(splits):
+        arrays[f"train_{fold}"] = train_index
+        arrays[f"valid_{fold}"] = valid_index
+
+    target = splits_path(path)
+    tmp_path = target + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, target)
+    return target
+
+
+def load_splits(path):
+    """
+    Load the training and validation row indices of every fold
+    :param path: path of the csv file
+    :return: list of (train_index, valid_index) numpy arrays
+    """
+    with np.load(splits_path(path)) as arrays:
+        n_splits = len(arrays.files) // 2
+        return [(arrays[f"train_{fold}"], arrays[f"valid_{fold}"]) for fold in range(n_splits)]
+
+
+def create_folds(input_file, n_splits=5, seed=42, output_file=None, chunksize=100_000):
+    """
+    Create and save the fold ids of a csv file
+    :param input_file: path of the csv file
+    :param n_splits: number of folds
+    :param seed: seed of the random generator
+    :param output_file: optional path of a copy of the csv file with
+                        a 'kfold' column, for scripts that need one
+    :param chunksize: number of rows written at a time to output_file
+    :return: numpy array with the fold of every row
+    """
+    ids = kfold_ids(count_rows(input_file), n_splits, seed)
+    save(ids, input_file)
+
+    if output_file:
+        # copy the csv file in chunks and add the fold of every row
+        start = 0
+        with open(output_file, "w", newline="") as f:
+            for chunk in pd.read_csv(input_file, chunksize=chunksize):
+                chunk["kfold"] = ids[start:start + len(chunk)]
+                chunk.to_csv(f, header=start == 0, index=False)
+                start += len(chunk)
+
+    print(f"Fold sizes: {np.bincount(ids).tolist()}")
+    return ids
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str)
+    parser.add_argument("--n_splits", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str)
+    args = parser.parse_args()
+
+    create_folds(args.input, n_splits=args.n_splits, seed=args.seed, output_file=args.output)
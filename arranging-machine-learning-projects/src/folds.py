@@ -0,0 +1,84 @@
+# This script creates training and validation arrays for every fold
+# without copying the whole dataset.
+
+# The usual way of splitting a fold is:
+#     df_train = df[df.kfold != fold].reset_index(drop=True)
+#     x_train = df_train.drop("label", axis=1).values
+# which makes a copy of the DataFrame for the filter, and another one
+# when dropping the column and converting it to numpy.
+
+# Here the row indices of every fold are calculated one time from the
+# 'kfold' column. x_train and x_valid are then gathered with np.take
+# straight from the feature block (which can be a memory-mapped file
+# from 'dataset_cache.load_matrix'), into new contiguous arrays.
+# So during cross-validation only x_train + x_valid, i.e. about one
+# dataset, is in memory, no matter how many folds we train.
+
+# Splits where the training rows are not all the other folds (like purged
+# time series splits) are given as lists of (train_index, valid_index)
+# arrays instead, for example from 'fold_ids.load_splits'.
+
+import numpy as np
+
+
+class FoldView:
+    """
+    Training and validation arrays of every fold of a dataset
+    """
+
+    def __init__(self, features, target, kfold=None, feature_names=None, splits=None):
+        """
+        :param features: 2D numpy array (or memmap) of features
+        :param target: numpy array of targets
+        :param kfold: numpy array with the fold of every row
+        :param feature_names: optional list with the name of every feature
+        :param splits: list of (train_index, valid_index) numpy arrays,
+                       used instead of 'kfold'
+        """
+        self.features = features
+        self.feature_names = feature_names
+        self.target = np.asarray(target)
+
+        # int32 indices use half the memory of int64 ones
+        index_type = np.int32 if len(self.target) < 2 ** 31 else np.int64
+
+        if splits is not None:
+            self.folds = np.arange(len(splits))
+            self.train_index = {}
+            self.valid_index = {}
+            for fold, (train_index, valid_index) in enumerate(splits):
+                self.train_index[fold] = np.sort(train_index).astype(index_type)
+                self.valid_index[fold] = np.sort(valid_index).astype(index_type)
+            return
+
+        kfold = np.asarray(kfold)
+
+        # sort the rows by fold once. the rows of every fold are then a
+        # slice of 'order', which we sort again so that the rows are read
+        # from the feature block in the order they are stored
+        order = np.argsort(kfold, kind="stable").astype(index_type)
+        self.folds, starts = np.unique(kfold[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        self.valid_index = {}
+        self.train_index = {}
+        for fold, start, end in zip(self.folds.tolist(), starts, ends):
+            self.valid_index[fold] = order[start:end]
+            self.train_index[fold] = np.concatenate((order[:start], order[end:]))
+            self.train_index[fold].sort()
+
+    def train(self, fold):
+        """
+        :param fold: fold used for validation
+        :return: tuple of (x_train, y_train) for this fold
+        """
+        index = self.train_index[fold]
+        return np.take(self.features, index, axis=0), self.target[index]
+
+    def valid(self, fold):
+        """
+        :param fold: fold used for validation
+        :return: tuple of (x_valid, y_valid) for this fold
+        """
+        index = self.valid_index[fold]
+        return np.take(self.features, index, axis=0), self.target[index]
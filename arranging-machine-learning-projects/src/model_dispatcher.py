@@ -1,17 +1,75 @@
 # This script is a model dispatchet, where we have a dictionary
 # that includes keys that are names of models and values that
-# are the models themselves. We can then call this dictionary
-# from the 'train.py' script the test with different models without 
+# describe how to build the models. We can then call 'get_model'
+# from the 'train.py' script the test with different models without
 # having to constantly define and change them in the main script
 
-from sklearn import tree, ensemble
+# The models are not created when this script is imported. Every entry
+# only stores where the model class lives and its default parameters.
+# 'get_model' imports the library when the model is first needed (so
+# heavy libraries like xgboost are only imported if we use them) and
+# returns a new instance every time, so that folds trained in the same
+# process, or at the same time, never share and refit the same object.
+
+import importlib
 
 models = {
-    "decision_tree_gini" : tree.DecisionTreeClassifier(
-        criterion="gini"
+    "decision_tree_gini" : (
+        "sklearn.tree.DecisionTreeClassifier",
+        {"criterion": "gini"},
+    ),
+    "decision_tree_entropy" : (
+        "sklearn.tree.DecisionTreeClassifier",
+        {"criterion": "entropy"},
+    ),
+    "rf" : (
+        "sklearn.ensemble.RandomForestClassifier",
+        {},
+    ),
+    # models with 'partial_fit', that can be trained with 'train.py --stream'
+    "sgd" : (
+        "sklearn.linear_model.SGDClassifier",
+        {"loss": "log_loss", "alpha": 1e-4},
+    ),
+    "gaussian_nb" : (
+        "sklearn.naive_bayes.GaussianNB",
+        {},
+    ),
+    "multinomial_nb" : (
+        "sklearn.naive_bayes.MultinomialNB",
+        {},
     ),
-    "decision_tree_entropy" : tree.DecisionTreeClassifier(
-        criterion="entropy"
+    "xgb" : (
+        "xgboost.XGBClassifier",
+        {"n_jobs": -1, "max_depth": 7, "n_estimators": 200},
     ),
-    "rf" : ensemble.RandomForestClassifier(),
-}
\ No newline at end of file
+}
+
+
+def register(name, class_path, **params):
+    """
+    Add a model to the dispatcher
+    :param name: name of the model
+    :param class_path: full import path of the model class,
+                       for example "sklearn.svm.SVC"
+    :param params: default parameters of the model
+    """
+    models[name] = (class_path, params)
+
+
+def get_model(name, **overrides):
+    """
+    Create a new instance of a model
+    :param name: name of the model
+    :param overrides: parameters that replace the default ones
+    :return: new, unfitted model
+    """
+    if name not in models:
+        raise ValueError(f"Unknown model: {name}. Choose from {sorted(models)}")
+
+    class_path, params = models[name]
+    module_name, class_name = class_path.rsplit(".", 1)
+
+    # the library is only imported here, the first time it is needed
+    model_class = getattr(importlib.import_module(module_name), class_name)
+    return model_class(**{**params, **overrides})
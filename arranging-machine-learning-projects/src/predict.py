@@ -0,0 +1,159 @@
+# This script scores a csv file with the models of all folds of a model,
+# and averages their predicted probabilities.
+
+# The input file is read in chunks, so that files that do not fit in
+# memory can be scored. Every chunk is sent to a pool of worker processes.
+# Each worker loads the fold models one time when it starts (see
+# 'artifacts.py'), so the models are never sent between processes.
+# The results are written to the output file as soon as they are ready,
+# in the same order as the input rows, and only a few chunks are in
+# flight at any time, so memory stays bounded no matter the file size.
+
+# The fold models may not all have seen every class (a rare class can be
+# missing from the training rows of a fold). So the probabilities of every
+# model are added to the columns of its own classes, out of the classes of
+# all the models, and a model gives 0 to the classes it has not seen.
+
+# Example:
+#   python predict.py --model rf --input ../input/mnist_test.csv --output ../models/rf_preds.csv
+
+import time
+import argparse
+import collections
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+import config
+import artifacts
+
+# fold models of the current worker process, with the output column of
+# every one of their classes, and the number of output columns. both are
+# set by '_init_worker'
+_worker_models = []
+_worker_n_classes = 0
+
+
+def _init_worker(model_name, classes):
+    """
+    Load the fold models one time in every worker process
+    :param model_name: name of the model
+    :param classes: sorted numpy array of the classes of all fold models
+    """
+    global _worker_n_classes
+    for model in artifacts.load_fold_models(model_name).values():
+        _worker_models.append((model, np.searchsorted(classes, model.classes_)))
+    _worker_n_classes = len(classes)
+
+
+def predict_chunk(x):
+    """
+    Average the predicted probabilities of all fold models
+    :param x: numpy array of features
+    :return: numpy array of shape (n_rows, n_classes)
+    """
+    probabilities = np.zeros((len(x), _worker_n_classes))
+    for model, positions in _worker_models:
+        probabilities[:, positions] += model.predict_proba(x)
+    probabilities /= len(_worker_models)
+    return probabilities
+
+
+def predict(model_name, input_file, output_file, chunksize=100_000, n_jobs=None, id_column=None):
+    """
+    Score a csv file with the fold models of a model
+    :param model_name: name of the model
+    :param input_file: csv file with the same feature columns as the training data
+    :param output_file: csv file for the predictions
+    :param chunksize: number of rows read at a time
+    :param n_jobs: number of worker processes, default is all cores
+    :param id_column: optional column of the input that is copied to the output
+    :return: number of rows that were scored
+    """
+    start = time.perf_counter()
+
+    entries = artifacts.load_manifest(model_name)
+    if not entries:
+        raise ValueError(f"No saved models found for: {model_name}")
+
+    # use the exact feature columns, in the same order, as in training.
+    # models saved without them were trained on all the columns except
+    # the target and the fold, in the order of the file
+    features = entries[0]["features"]
+    if features is None:
+        header = pd.read_csv(input_file, nrows=0).columns
+        features = [
+            c for c in header if c not in config.NON_FEATURE_COLUMNS and c != id_column
+        ]
+    if any(entry["features"] not in (None, features) for entry in entries):
+        raise ValueError(f"The fold models of {model_name} use different features")
+
+    # the classes of all fold models together, sorted like 'classes_'. they
+    # are read from the manifest. only models saved before it recorded the
+    # classes have to be loaded here
+    classes = np.unique(np.concatenate([
+        entry["classes"] if entry.get("classes") is not None
+        else artifacts.load_model(model_name, entry["fold"]).classes_
+        for entry in entries
+    ]))
+    columns = [f"prob_{c}" for c in classes]
+
+    usecols = features + ([id_column] if id_column else [])
+    reader = pd.read_csv(input_file, usecols=usecols, chunksize=chunksize)
+
+    n_jobs = n_jobs or multiprocessing.cpu_count()
+    n_rows = 0
+
+    with multiprocessing.Pool(n_jobs, initializer=_init_worker, initargs=(model_name, classes)) as pool, \
+            open(output_file, "w", newline="") as f:
+
+        pending = collections.deque()
+        header = True
+
+        def write_next():
+            # write the oldest chunk, waiting for it if it is not ready
+            ids, result = pending.popleft()
+            out = pd.DataFrame(result.get(), columns=columns)
+            out["prediction"] = classes[np.argmax(out.values, axis=1)]
+            if ids is not None:
+                out.insert(0, id_column, ids)
+            out.to_csv(f, header=header, index=False)
+            return len(out)
+
+        for chunk in reader:
+            ids = chunk[id_column].values if id_column else None
+            pending.append((ids, pool.apply_async(predict_chunk, (chunk[features].values,))))
+
+            # keep at most two chunks per worker in flight
+            if len(pending) >= 2 * n_jobs:
+                n_rows += write_next()
+                header = False
+
+        while pending:
+            n_rows += write_next()
+            header = False
+
+    print(f"Scored {n_rows} rows in {time.perf_counter() - start:.2f}s")
+    return n_rows
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str)
+    parser.add_argument("--input", type=str)
+    parser.add_argument("--output", type=str)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--n_jobs", type=int)
+    parser.add_argument("--id_column", type=str)
+    args = parser.parse_args()
+
+    predict(
+        model_name=args.model,
+        input_file=args.input,
+        output_file=args.output,
+        chunksize=args.chunksize,
+        n_jobs=args.n_jobs,
+        id_column=args.id_column,
+    )
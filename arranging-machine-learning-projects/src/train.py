@@ -1,68 +1,281 @@
 # This performs training using the MNIST data on a decision tree classifier
 
 import os
+import json
+import time
 import argparse
+import multiprocessing
 
-import joblib
+import numpy as np
 import pandas as pd
 from sklearn import metrics
 
 import config
+import folds
+import fold_ids
+import artifacts
+import instrument
+import dataset_cache
 import model_dispatcher
 
+# data shared with the worker processes when all folds are trained
+# in parallel. it is set in the parent process before the pool is
+# created, so forked workers see it without copying or re-reading it
+_shared_data = {}
 
-def run(fold, model):
 
-    # read the csv of the data with the folds
-    df = pd.read_csv(config.TRAINING_FILE)
+def load_data():
+    """
+    Load the training data one time, as a view that serves
+    the training and validation arrays of every fold
+    :return: FoldView of the training data
+    """
+    # the csv is converted to a binary cache the first time,
+    # and later runs load that cache instead of parsing the text
+    columns = dataset_cache.load_meta(config.TRAINING_FILE)["columns"]
+
+    # the image pixel data are the features, stored together as one
+    # memory-mapped block. the label column values are the targets
+    feature_names = [
+        c["name"] for c in columns if c["name"] not in config.NON_FEATURE_COLUMNS
+    ]
+    x = dataset_cache.load_matrix(config.TRAINING_FILE, feature_names)
+    data = dataset_cache.load_columns(config.TRAINING_FILE, ["label", "kfold"])
+
+    # without a 'kfold' column, the folds come from the split index file
+    # saved with 'fold_ids.save_splits' (for example purged time series
+    # splits), or else from the fold id file written by 'create_folds.py'
+    if "kfold" not in data and os.path.exists(fold_ids.splits_path(config.TRAINING_FILE)):
+        splits = fold_ids.load_splits(config.TRAINING_FILE)
+        if any(index.max(initial=-1) >= len(x) for split in splits for index in split):
+            raise ValueError("The split indices do not match the training file, save the splits again")
+        return folds.FoldView(x, data["label"], feature_names=feature_names, splits=splits)
+
+    kfold = data["kfold"] if "kfold" in data else fold_ids.load(config.TRAINING_FILE)
+    if len(kfold) != len(x):
+        raise ValueError("The fold ids do not match the training file, run create_folds.py again")
+    return folds.FoldView(x, data["label"], kfold, feature_names)
+
+
+def train_fold(data, fold, model, params=None):
+    """
+    Train and evaluate a model on one fold
+    :param data: FoldView of the training data
+    :param fold: fold used for validation
+    :param model: name of the model in model_dispatcher
+    :param params: optional dictionary of model parameters
+    :return: validation accuracy
+    """
 
     # when we use a dataset for training and validation with kfold, we set which folds
-    # we want for training and which ones we want for validation. for example, if we 
+    # we want for training and which ones we want for validation. for example, if we
     # set fold = 0, then we are saying that we want to use the data with kfold value = 0
     # for vlaidation and use the data in all the other folds for training.
-    # this is exactly what we do here
-    df_train = df[df.kfold != fold].reset_index(drop=True)
-    df_valid = df[df.kfold == fold].reset_index(drop=True)
-
-    # drop the label column values and store the actual image pixel data
-    # and the fold information in 'x_train'. this is stored as a numpy array.
-    # then store the label column values in the 'y_train' numpy array
-    x_train = df_train.drop("label", axis=1).values
-    y_train = df_train.label.values
+    # this is exactly what we do here. the rows of every fold are gathered
+    # straight from the feature block into new contiguous arrays
+    profiler = instrument.Profiler("train", model=model, fold=fold)
+    with profiler.stage("split"):
+        x_train, y_train = data.train(fold)
+        x_valid, y_valid = data.valid(fold)
 
-    # do the same for the validation data
-    x_valid = df_valid.drop("label", axis=1).values
-    y_valid = df_valid.label.values
-
-    # initialize a simple decision tree classifier from sklearn
-    clf = model_dispatcher.models[model]
+    # create a new instance of the model for this fold
+    clf = model_dispatcher.get_model(model, **(params or {}))
 
     # fit the model on training data. the .fit() method takes two parameters,
     # the first one is 'X', which is an array of shape (n_samples, n_features),
     # and the second one is of shape (n_samples,)
-    clf.fit(x_train, y_train)
+    with profiler.stage("fit"):
+        clf.fit(x_train, y_train)
 
     # create predictions for validation samples
-    preds = clf.predict(x_valid)
+    with profiler.stage("predict"):
+        preds = clf.predict(x_valid)
 
     # calculate and print the accuracy
-    accuracy = metrics.accuracy_score(y_valid, preds)
+    with profiler.stage("metric"):
+        accuracy = metrics.accuracy_score(y_valid, preds)
+    print(f"Fold = {fold}, Accuracy = {accuracy}")
+
+    # save the model, and record its fold number, accuracy and the
+    # features it was trained on in the manifest
+    with profiler.stage("dump"):
+        artifacts.save_model(
+            clf, model, fold, {"accuracy": accuracy},
+            features=data.feature_names, compress=config.MODEL_COMPRESS)
+    return accuracy
+
+
+def run(fold, model, params=None):
+
+    # read the csv of the data with the folds
+    with instrument.Profiler("train", model=model, fold=fold).stage("load"):
+        data = load_data()
+    return train_fold(data, fold, model, params)
+
+
+def _stream_chunks(fold, columns, chunksize, valid, kfold=None):
+    """
+    Read the training file in chunks and yield the rows of one side of a fold
+    :param fold: fold used for validation
+    :param columns: feature columns
+    :param chunksize: number of rows read at a time
+    :param valid: True for the validation rows, False for the training rows
+    :param kfold: optional fold ids of the rows, if the file has no 'kfold' column
+    :return: generator of (x, y) numpy arrays
+    """
+    usecols = columns + ["label"] + (["kfold"] if kfold is None else [])
+    reader = pd.read_csv(config.TRAINING_FILE, usecols=usecols, chunksize=chunksize)
+    start = 0
+    for chunk in reader:
+        if kfold is None:
+            mask = (chunk.kfold == fold).values
+        else:
+            mask = np.asarray(kfold[start:start + len(chunk)]) == fold
+            if len(mask) != len(chunk):
+                raise ValueError("The fold ids do not match the training file, run create_folds.py again")
+        start += len(chunk)
+        if not valid:
+            mask = ~mask
+        if mask.any():
+            rows = chunk[mask]
+            yield rows[columns].to_numpy(dtype=np.float32), rows.label.values
+
+
+def run_streaming(fold, model, params=None, chunksize=None, epochs=1):
+    """
+    Train and evaluate a model on one fold without loading the training
+    file in memory. The model must have a 'partial_fit' method
+    :param fold: fold used for validation
+    :param model: name of the model in model_dispatcher
+    :param params: optional dictionary of model parameters
+    :param chunksize: number of rows read at a time
+    :param epochs: number of passes over the training rows
+    :return: validation accuracy
+    """
+    chunksize = chunksize or config.STREAM_CHUNKSIZE
+    profiler = instrument.Profiler("train", model=model, fold=fold, mode="stream")
+
+    clf = model_dispatcher.get_model(model, **(params or {}))
+    if not hasattr(clf, "partial_fit"):
+        raise ValueError(f"Model {model} does not support partial_fit")
+
+    # only the header is read here. memory use depends on the
+    # chunk size, not on the size of the file
+    header = pd.read_csv(config.TRAINING_FILE, nrows=0).columns
+    feature_names = [c for c in header if c not in config.NON_FEATURE_COLUMNS]
+    kfold = None if "kfold" in header else fold_ids.load(config.TRAINING_FILE)
+
+    # partial_fit needs all classes on the first call, but the first chunk
+    # may not have all of them, so we read the label column one time first
+    with profiler.stage("classes"):
+        classes = np.unique(np.concatenate([
+            chunk.label.unique() for chunk in pd.read_csv(
+                config.TRAINING_FILE, usecols=["label"], chunksize=chunksize)
+        ]))
+
+    # every epoch is one pass over the training rows of the file
+    with profiler.stage("fit"):
+        n_train = 0
+        for _ in range(epochs):
+            for x_train, y_train in _stream_chunks(fold, feature_names, chunksize, valid=False, kfold=kfold):
+                clf.partial_fit(x_train, y_train, classes=classes)
+                n_train += len(y_train)
+    if n_train == 0:
+        raise ValueError(f"Fold {fold} has no training rows")
+
+    # the validation rows are scored chunk by chunk, and only the
+    # number of correct predictions is kept
+    with profiler.stage("predict"):
+        correct = total = 0
+        for x_valid, y_valid in _stream_chunks(fold, feature_names, chunksize, valid=True, kfold=kfold):
+            correct += np.sum(clf.predict(x_valid) == y_valid)
+            total += len(y_valid)
+    if total == 0:
+        raise ValueError(f"Fold {fold} has no validation rows")
+    accuracy = correct / total
     print(f"Fold = {fold}, Accuracy = {accuracy}")
 
-    # save the model, including fold number and its accuracy
-    joblib.dump(clf, os.path.join(config.MODEL_OUTPUT, f"dt_{fold}_{accuracy}"))
-    
+    with profiler.stage("dump"):
+        artifacts.save_model(
+            clf, model, fold, {"accuracy": accuracy},
+            features=feature_names, compress=config.MODEL_COMPRESS)
+    return accuracy
+
+
+def _train_shared_fold(fold, model, params):
+    """
+    Train one fold on the data that was loaded by the parent process
+    """
+    return train_fold(_shared_data["data"], fold, model, params)
+
+
+def run_all_folds(model, params=None, n_jobs=None):
+    """
+    Read the training data one time and train all folds in parallel
+    :param model: name of the model in model_dispatcher
+    :param params: optional dictionary of model parameters
+    :param n_jobs: number of worker processes, default is one per fold
+    :return: dictionary of fold: accuracy
+    """
+    start = time.perf_counter()
+
+    # the features are a read-only memory-mapped block, so the forked
+    # workers share its memory pages with the parent process
+    with instrument.Profiler("train", model=model).stage("load"):
+        data = load_data()
+    all_folds = data.folds.tolist()
+    _shared_data.update(data=data)
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes=n_jobs or len(all_folds)) as pool:
+            accuracies = pool.starmap(
+                _train_shared_fold, [(fold, model, params) for fold in all_folds])
+    else:
+        # without fork every worker would need its own copy of the
+        # data, so we train the folds one after the other instead
+        accuracies = [_train_shared_fold(fold, model, params) for fold in all_folds]
+
+    _shared_data.clear()
+
+    print(f"Mean accuracy = {np.mean(accuracies)}")
+    print(f"Total time = {time.perf_counter() - start:.2f}s")
+    return dict(zip(all_folds, accuracies))
+
+
 if __name__ == "__main__":
 
     # initialize an ArgumentParser class of argparse
     parser = argparse.ArgumentParser()
-        
-    # add the arguments that we want and their type
+
+    # add the arguments that we want and their type. if no fold
+    # is given, all folds are trained in parallel
     parser.add_argument("--fold", type=int)
     parser.add_argument("--model", type=str)
+    parser.add_argument("--n_jobs", type=int)
+
+    # optional model parameters as json, for example '{"max_depth": 7}'
+    parser.add_argument("--params", type=json.loads, default={})
+
+    # train on the csv in chunks instead of loading it in memory. only for
+    # models with partial_fit, like sgd or the naive bayes models
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--chunksize", type=int)
+    parser.add_argument("--epochs", type=int, default=1)
 
     # read the arguments from the command line
     args = parser.parse_args()
 
-    # traing the decision tree on the fold that we passed as an argument
-    run(fold=args.fold, model=args.model)
+    if args.stream:
+        # train the folds one after the other, each one reading the file
+        stream_folds = [args.fold] if args.fold is not None else config.STREAM_FOLDS
+        for fold in stream_folds:
+            run_streaming(
+                fold=fold, model=args.model, params=args.params,
+                chunksize=args.chunksize, epochs=args.epochs)
+    elif args.fold is None:
+        # train all folds, reading the data only one time
+        run_all_folds(model=args.model, params=args.params, n_jobs=args.n_jobs)
+    else:
+        # traing the decision tree on the fold that we passed as an argument
+        run(fold=args.fold, model=args.model, params=args.params)
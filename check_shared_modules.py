@@ -0,0 +1,69 @@
+# This script checks that the shared helper modules are the same everywhere.
+
+# Every chapter folder is run on its own (for example 'cd src && python
+# train.py'), so the helper modules that several chapters use are copied
+# into each of them instead of being imported from one place. The copies
+# must stay byte-identical. The copy in 'arranging-machine-learning-projects/src'
+# is the one that is edited; '--sync' copies it over the other ones.
+
+# Examples:
+#   python check_shared_modules.py          (exits with 1 if a copy differs)
+#   python check_shared_modules.py --sync   (overwrites the copies)
+
+import os
+import sys
+import shutil
+import filecmp
+import argparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join("arranging-machine-learning-projects", "src")
+
+# shared module: folders that hold a copy of it
+COPIES = {
+    "dataset_cache.py": [
+        os.path.join("approaching-categorical-variables", "src"),
+        os.path.join("hyperparameter-optimization", "src"),
+    ],
+    "instrument.py": [
+        os.path.join("approaching-categorical-variables", "src"),
+        os.path.join("hyperparameter-optimization", "src"),
+    ],
+    "fold_ids.py": [
+        "cross-validation",
+    ],
+}
+
+
+def differing_copies():
+    """
+    :return: list of (source path, copy path) of the copies that differ
+    """
+    differing = []
+    for name, folders in COPIES.items():
+        source = os.path.join(ROOT, SOURCE_DIR, name)
+        for folder in folders:
+            copy = os.path.join(ROOT, folder, name)
+            if not os.path.exists(copy) or not filecmp.cmp(source, copy, shallow=False):
+                differing.append((source, copy))
+    return differing
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sync", action="store_true")
+    args = parser.parse_args()
+
+    differing = differing_copies()
+    for source, copy in differing:
+        if args.sync:
+            shutil.copyfile(source, copy)
+            print(f"Updated {os.path.relpath(copy, ROOT)}")
+        else:
+            print(f"{os.path.relpath(copy, ROOT)} differs from {os.path.relpath(source, ROOT)}")
+
+    if differing and not args.sync:
+        sys.exit(1)
+    if not differing:
+        print("All shared modules are identical")
@@ -6,94 +6,177 @@
 # There is two different ways that this problem can be looked at: classification and
 # regression. 
 
+# The accuracy for every max depth can be calculated in two ways:
+#   - "prefix": fit one deep tree, and cut it at every depth. a tree with
+#     max_depth=d makes the same splits as the first d levels of a deeper
+#     tree (the splits of a node do not depend on the depth limit), so the
+#     prediction of the shallow tree is the majority class of the node that
+#     a sample reaches after d levels. one fit answers all the depths
+#   - "refit": fit one tree per depth, in parallel on all cores. the
+#     features are one float32 array (the type that trees use internally)
+#     that the forked worker processes share instead of copying
+# Ties between splits that are equally good can be broken differently,
+# so the two methods can differ slightly.
+
 # Import necessary packages
+import multiprocessing
+
+import numpy as np
 import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn import tree
-from sklearn import metrics
-
-# Read dataset from csv file
-df = pd.read_csv("winequality-red.csv")
-
-# All of the 'quality' values in the dataset are between (including) 3 and 8.
-# To make things simpler, those values are mapped to the values 0 to 5.
-quality_mapping = {
-    3: 0,
-    4: 1,
-    5: 2,
-    6: 3,
-    7: 4,
-    8: 5
-}
-df.loc[:, "quality"] = df.quality.map(quality_mapping)
-
-# Shuffle the rows in the dataset. This is always an important step to perform
-# on data before training a model on that data
-df = df.sample(frac=1).reset_index(drop=True)
-
-# Split the data into a training set (1000) and a testing/validation set (599)
-df_train = df.head(1000)
-df_test = df.tail(599)
-
-# Choose the columns that the tree classifier will be trained on,
-# which are basically the features for the model
-cols = ['fixed acidity', 
-        'volatile acidity', 
-        'citric acid', 
-        'residual sugar', 
-        'chlorides', 
-        'free sulfur dioxide', 
-        'total sulfur dioxide', 
-        'density', 
-        'pH', 
-        'sulphates', 
-        'alcohol']
-
-# Initialize lists to store the different accuracy measurements
-# from various training runs with different model depth numbers
-train_accuracies = [0.5]
-test_accuracies = [0.5]
-
-# For-loop to train the model over a few different depth values, 
-# calculating their accuracy measurements, and storing them for 
-# plotting and comparison
-for depth in range(1, 25):
-    # Initialize a decision tree classifier with depth value
-    clf = tree.DecisionTreeClassifier(max_depth=depth)
-    
-    # Train the model on the features selected and their
-    # corresponding mapped qualities
-    clf.fit(df_train[cols], df_train.quality)
-
-    # Generate predictions on the training and testing data
-    # using the trained tree classifier
-    train_predictions = clf.predict(df_train[cols])
-    test_predictions = clf.predict(df_test[cols])
-
-    # Calculcate accuracy measurements using the training and
-    # testing predictions previously generated
-    train_accuracy = metrics.accuracy_score(
-        df_train.quality, train_predictions)
-    test_accuracy = metrics.accuracy_score(
-        df_test.quality, test_predictions)
-
-    # Append the accuracy measurements into their lists
-    train_accuracies.append(train_accuracy)
-    test_accuracies.append(test_accuracy)
-
-# Set the global size of the lbel text on the plots
-matplotlib.rc('xtick', labelsize=12)
-matplotlib.rc('ytick', labelsize=12)
-
-# Create two plots using matplotlib and seaborn
-plt.figure(figsize=(10, 5))   # Set the width and height of plot in inches
-sns.set_style("whitegrid")
-plt.plot(train_accuracies, label="train accuracy")
-plt.plot(test_accuracies, label="test accuracy")
-plt.legend(loc="lower right", prop={'size' : 10})
-plt.xticks(range(0, 26, 5))
-plt.xlabel("max depth", size=12)
-plt.ylabel("accuracy", size=12)
-plt.show()
\ No newline at end of file
+
+# data shared with the forked worker processes of the "refit" method
+_shared_data = {}
+
+
+def _predict_per_depth(clf, x, max_depth):
+    """
+    Predict with the first levels of a fitted tree, for every depth
+    :param clf: fitted DecisionTreeClassifier
+    :param x: float32 numpy array of features
+    :param max_depth: largest depth to predict with
+    :return: numpy array (max_depth, n_samples) of predictions, row d-1
+             has the predictions of a tree with max_depth=d
+    """
+    tree_ = clf.tree_
+    node = np.zeros(len(x), dtype=np.int64)
+    rows = np.arange(len(x))
+    predictions = np.empty((max_depth, len(x)), dtype=clf.classes_.dtype)
+
+    for depth in range(max_depth):
+        # move every sample one level down, samples in leaves (nodes
+        # without children, marked with -1) stay where they are
+        inner = tree_.children_left[node] != -1
+        go_left = x[rows, tree_.feature[node]] <= tree_.threshold[node]
+        child = np.where(go_left, tree_.children_left[node], tree_.children_right[node])
+        node = np.where(inner, child, node)
+
+        # the prediction of a node is its majority class
+        predictions[depth] = clf.classes_[np.argmax(tree_.value[node, 0], axis=1)]
+    return predictions
+
+
+def _fit_depth(depth, random_state):
+    """
+    Fit one tree on the data that was shared by the parent process
+    :return: tuple of (train accuracy, test accuracy)
+    """
+    x_train, y_train, x_test, y_test = _shared_data["data"]
+    clf = tree.DecisionTreeClassifier(max_depth=depth, random_state=random_state)
+    clf.fit(x_train, y_train)
+    return (
+        np.mean(clf.predict(x_train) == y_train),
+        np.mean(clf.predict(x_test) == y_test),
+    )
+
+
+def depth_sweep(x_train, y_train, x_test, y_test, depths=range(1, 25), method="prefix",
+                n_jobs=None, random_state=42):
+    """
+    Calculate the train and test accuracy of decision trees of different depths
+    :param x_train: training features
+    :param y_train: training targets
+    :param x_test: test features
+    :param y_test: test targets
+    :param depths: max depth values
+    :param method: "prefix" to cut one deep tree, "refit" to fit one tree per depth
+    :param n_jobs: number of worker processes for "refit", default is all cores
+    :param random_state: random state of the trees
+    :return: pandas DataFrame with the depth, train accuracy and test accuracy
+    """
+    depths = list(depths)
+    x_train = np.ascontiguousarray(x_train, dtype=np.float32)
+    x_test = np.ascontiguousarray(x_test, dtype=np.float32)
+    y_train = np.asarray(y_train)
+    y_test = np.asarray(y_test)
+
+    if method == "prefix":
+        clf = tree.DecisionTreeClassifier(max_depth=max(depths), random_state=random_state)
+        clf.fit(x_train, y_train)
+        train_predictions = _predict_per_depth(clf, x_train, max(depths))
+        test_predictions = _predict_per_depth(clf, x_test, max(depths))
+        accuracies = [
+            (np.mean(train_predictions[d - 1] == y_train), np.mean(test_predictions[d - 1] == y_test))
+            for d in depths
+        ]
+    elif method == "refit":
+        _shared_data.update(data=(x_train, y_train, x_test, y_test))
+        tasks = [(depth, random_state) for depth in depths]
+        if "fork" in multiprocessing.get_all_start_methods():
+            with multiprocessing.get_context("fork").Pool(n_jobs) as pool:
+                accuracies = pool.starmap(_fit_depth, tasks)
+        else:
+            accuracies = [_fit_depth(*task) for task in tasks]
+        _shared_data.clear()
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    return pd.DataFrame(accuracies, index=pd.Index(depths, name="max_depth"),
+                        columns=["train_accuracy", "test_accuracy"]).reset_index()
+
+
+if __name__ == "__main__":
+
+    # Read dataset from csv file
+    df = pd.read_csv("winequality-red.csv")
+
+    # All of the 'quality' values in the dataset are between (including) 3 and 8.
+    # To make things simpler, those values are mapped to the values 0 to 5.
+    quality_mapping = {
+        3: 0,
+        4: 1,
+        5: 2,
+        6: 3,
+        7: 4,
+        8: 5
+    }
+    df.loc[:, "quality"] = df.quality.map(quality_mapping)
+
+    # Shuffle the rows in the dataset. This is always an important step to perform
+    # on data before training a model on that data
+    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+
+    # Split the data into a training set (1000) and a testing/validation set (599)
+    df_train = df.head(1000)
+    df_test = df.tail(599)
+
+    # Choose the columns that the tree classifier will be trained on,
+    # which are basically the features for the model
+    cols = ['fixed acidity', 
+            'volatile acidity', 
+            'citric acid', 
+            'residual sugar', 
+            'chlorides', 
+            'free sulfur dioxide', 
+            'total sulfur dioxide', 
+            'density', 
+            'pH', 
+            'sulphates', 
+            'alcohol']
+
+    # Train and test trees with depth values 1 to 24, using one deep
+    # tree for all of them, and print the accuracy measurements
+    results = depth_sweep(
+        df_train[cols].values, df_train.quality.values,
+        df_test[cols].values, df_test.quality.values,
+        depths=range(1, 25), method="prefix",
+    )
+    print(results.to_string(index=False))
+
+    # Set the global size of the lbel text on the plots
+    matplotlib.rc('xtick', labelsize=12)
+    matplotlib.rc('ytick', labelsize=12)
+
+    # Create two plots using matplotlib and seaborn
+    plt.figure(figsize=(10, 5))   # Set the width and height of plot in inches
+    sns.set_style("whitegrid")
+    plt.plot(results.max_depth, results.train_accuracy, label="train accuracy")
+    plt.plot(results.max_depth, results.test_accuracy, label="test accuracy")
+    plt.legend(loc="lower right", prop={'size' : 10})
+    plt.xticks(range(0, 26, 5))
+    plt.xlabel("max depth", size=12)
+    plt.ylabel("accuracy", size=12)
+    plt.show()
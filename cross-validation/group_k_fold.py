@@ -0,0 +1,139 @@
+# This shows how group k-fold and stratified group k-fold work.
+
+# When the same group (for example a customer, a patient or a device)
+# has many rows, plain k-fold puts rows of the same group in training and
+# validation, and the model can learn the group instead of the target.
+# Group k-fold keeps all the rows of a group in the same fold, and
+# stratified group k-fold also tries to keep the same proportion of every
+# class in every fold.
+
+# The groups are integer codes 0..n_groups-1 (for example from
+# 'pd.factorize'). The work is done on the counts of every group, and the
+# fold of every row is then found with one lookup, so it takes O(n) on the
+# rows. The fold ids can be saved next to the data with 'fold_ids.save',
+# so that the training scripts read them instead of recomputing them.
+
+import os
+import heapq
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import fold_ids
+
+
+def _fold_dtype(n_splits):
+    """
+    :param n_splits: number of folds
+    :return: smallest integer type that holds every fold, like 'fold_ids.kfold_ids'
+    """
+    return np.int8 if n_splits <= np.iinfo(np.int8).max else np.int32
+
+
+def group_kfold_ids(groups, n_splits=5):
+    """
+    Assign every group to a fold, so that the folds have about the same
+    number of rows. like sklearn's GroupKFold, the largest groups are
+    placed first, each one in the fold that has the fewest rows
+    :param groups: numpy array with the integer group code of every row
+    :param n_splits: number of folds
+    :return: numpy array with the fold of every row
+    """
+    groups = np.asarray(groups)
+    sizes = np.bincount(groups)
+    if np.count_nonzero(sizes) < n_splits:
+        raise ValueError("The number of groups must be at least n_splits")
+
+    # heap of (rows in the fold, fold), the smallest fold is always first
+    heap = [(0, fold) for fold in range(n_splits)]
+    group_fold = np.empty(len(sizes), dtype=_fold_dtype(n_splits))
+    for group in np.argsort(-sizes, kind="stable"):
+        n_rows, fold = heapq.heappop(heap)
+        group_fold[group] = fold
+        heapq.heappush(heap, (n_rows + int(sizes[group]), fold))
+
+    # the fold of every row is the fold of its group
+    return group_fold[groups]
+
+
+def stratified_group_kfold_ids(groups, y, n_splits=5, seed=42):
+    """
+    Assign every group to a fold, keeping the class proportions of the
+    folds as close as possible, like sklearn's StratifiedGroupKFold
+    :param groups: numpy array with the integer group code of every row
+    :param y: numpy array with the class of every row
+    :param n_splits: number of folds
+    :param seed: seed of the random generator that breaks ties
+    :return: numpy array with the fold of every row
+    """
+    groups = np.asarray(groups)
+    classes, y_codes = np.unique(y, return_inverse=True)
+    n_groups = groups.max() + 1
+    n_classes = len(classes)
+
+    # number of rows of every class in every group
+    group_counts = np.bincount(
+        groups * n_classes + y_codes, minlength=n_groups * n_classes
+    ).reshape(n_groups, n_classes)
+    class_totals = group_counts.sum(axis=0)
+
+    # groups with the most uneven classes are the hardest to place, so
+    # they go first. groups with the same spread are in a random order
+    order = np.random.default_rng(seed).permutation(n_groups)
+    spread = np.std(group_counts[order], axis=1)
+    order = order[np.argsort(-spread, kind="stable")]
+
+    fold_counts = np.zeros((n_splits, n_classes), dtype=np.int64)
+    group_fold = np.empty(n_groups, dtype=_fold_dtype(n_splits))
+    add = np.eye(n_splits, dtype=np.int64)[:, :, None]
+    for group in order:
+        counts = group_counts[group]
+        if not counts.any():
+            group_fold[group] = 0
+            continue
+
+        # class proportions of the folds for every possible choice of fold:
+        # trial[i] are the fold counts if the group is added to fold i
+        trial = fold_counts[None, :, :] + add * counts
+        score = np.std(trial / class_totals, axis=1).mean(axis=1)
+
+        # of the best folds, take the one with the fewest rows
+        best = np.flatnonzero(score == score.min())
+        fold = best[np.argmin(fold_counts[best].sum(axis=1))]
+        fold_counts[fold] += counts
+        group_fold[group] = fold
+
+    return group_fold[groups]
+
+
+if __name__ == "__main__":
+
+    # Create a sample dataset of 200 customers with 1 to 50 rows each,
+    # and a skewed binary target that depends on the customer
+    rng = np.random.default_rng(0)
+    customers = np.repeat(np.arange(200), rng.integers(1, 50, size=200))
+    df = pd.DataFrame({
+        "customer": [f"customer_{c}" for c in customers],
+        "target": (rng.random(200)[customers] < 0.2).astype(int),
+    })
+
+    # Encode the groups as integers 0..n_groups-1
+    groups, _ = pd.factorize(df.customer)
+
+    df["kfold"] = group_kfold_ids(groups, n_splits=5)
+    df["stratified_kfold"] = stratified_group_kfold_ids(groups, df.target.values, n_splits=5)
+
+    # No customer is in more than one fold
+    print(df.groupby("customer").kfold.nunique().max())
+    print(df.groupby("customer").stratified_kfold.nunique().max())
+
+    # Rows and share of the positive class of every fold
+    print(df.groupby("kfold").target.agg(["size", "mean"]))
+    print(df.groupby("stratified_kfold").target.agg(["size", "mean"]))
+
+    # Save the fold ids next to the data, for the training scripts. the
+    # sample data is written to a temporary folder, not next to this script
+    path = os.path.join(tempfile.mkdtemp(), "group_train.csv")
+    df.to_csv(path, index=False)
+    print(fold_ids.save(df.stratified_kfold.values, path))
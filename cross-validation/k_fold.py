@@ -7,31 +7,32 @@
 # dataset is made up of images, a csv file can be created with 'image id', 
 # 'image location', and 'image label', and k-fold can be used to split the data.
 
+# Shuffling the rows and cutting them in k parts is the same as shuffling
+# an array of fold ids, so we do not shuffle or rewrite the data itself.
+# With a fixed seed we get the same folds every time. The fold ids are
+# saved in the small file 'winequality-red.csv.kfold.npy' (see 'fold_ids.py')
+
 # Import necessary packages
+import numpy as np
 import pandas as pd
-from sklearn import model_selection
+
+import fold_ids
 
 if __name__ == "__main__":
 
     # Read the dataset stored in 'train.csv'
     df = pd.read_csv("winequality-red.csv")
 
-    # Create a new column called 'kfold' and fill it with -1
-    df["kfold"] = -1
-
-    # Shuffle the rows of the data
-    df = df.sample(frac=1).reset_index(drop=True)
-
-    # Initiate the kfold class from the 'model_selection' module
-    kf = model_selection.KFold(n_splits=5)
+    # Assign every row to one of 5 folds, with the same fold
+    # sizes as sklearn's KFold, using a fixed seed
+    kfold = fold_ids.kfold_ids(len(df), n_splits=5, seed=42)
 
-    # Fill the new kfold column and split the data into 5 sections
     # Print the different variables to better understand what they are
-    for fold, (trn_, val_) in enumerate(kf.split(X=df)):
+    for fold in range(5):
         print('fold: ', fold)
-        print('trn_: ', trn_)
-        print('val_: ', val_)
-        df.loc[val_, 'kfold'] = fold
+        print('trn_: ', np.flatnonzero(kfold != fold))
+        print('val_: ', np.flatnonzero(kfold == fold))
 
-    # Save the data into a new file 'train_folds.csv'
-    df.to_csv("train_folds.csv", index=False)
+    # Save the fold of every row next to the data, instead of
+    # writing the whole dataset again with a new 'kfold' column
+    fold_ids.save(kfold, "winequality-red.csv")
@@ -2,37 +2,46 @@ import pandas as pd
 import numpy as np
 
 from sklearn import datasets
-from sklearn import model_selection
 
-def create_folds(data):
-
-    # Create a new column called 'kfold' and fill it with -1
-    # and shuffle the rows of data
-    data["kfold"] = -1
-    data = data.sample(frac=1).reset_index(drop=True)
+def create_folds(target, n_splits=5, binning="sturges", seed=42):
+    """
+    Create stratified folds for a regression target, by binning the target
+    and spreading the rows of every bin over the folds. only the target
+    array is used, so the data itself is never shuffled or copied
+    :param target: numpy array of targets
+    :param n_splits: number of folds
+    :param binning: "sturges" for equal-width bins (like 'pandas.cut')
+                    or "quantile" for bins with the same number of rows
+    :param seed: seed of the random generator
+    :return: numpy array with the fold of every row
+    """
+    target = np.asarray(target)
 
     # Use Sturge's rule to calculate the number of bins
-    num_bins = int(np.floor(1 + np.log2(len(data))))
-
-    # Bin the targets using 'pandas.cut', which is used to
-    # segment and sort data values into bins. 'cut' is useful
-    # for going from a continuous variable to a categorical 
-    # variable. It also supports binning into an equal number 
-    # of bins, or a pre-specified array of bins
-    data.loc[:, "bins"] = pd.cut(
-        data["target"], bins=num_bins, labels=False
-    )
+    num_bins = int(np.floor(1 + np.log2(len(target))))
 
-    # Initiate the stratified kfold class from the 'model_selection' module
-    kf = model_selection.StratifiedKFold(n_splits=5)
+    # Bin the targets using 'numpy.digitize', which returns the bin of
+    # every value given the edges between the bins. 'sturges' uses
+    # edges at the same distance from each other, and 'quantile' uses
+    # the quantiles of the targets as edges
+    if binning == "sturges":
+        edges = np.linspace(target.min(), target.max(), num_bins + 1)[1:-1]
+    elif binning == "quantile":
+        edges = np.unique(np.quantile(target, np.linspace(0, 1, num_bins + 1)[1:-1]))
+    else:
+        raise ValueError(f"Unknown binning: {binning}")
+    bins = np.digitize(target, edges, right=True)
 
-    # Fill the new kfold column using the data from 'bins'
-    for f, (t_, v_) in enumerate(kf.split(X=data, y=data.bins.values)):
-        data.loc[v_, 'kfold'] = f
+    # Shuffle the rows, then sort them by bin (the sort is stable, so the
+    # rows of every bin stay shuffled). Giving the folds in turns along
+    # this order spreads every bin evenly over the folds, and all folds
+    # get the same number of rows (+-1)
+    order = np.random.default_rng(seed).permutation(len(target))
+    order = order[np.argsort(bins[order], kind="stable")]
 
-    # Drop the 'bins' column
-    data = data.drop("bins", axis=1)
-    return data
+    kfold = np.empty(len(target), dtype=np.int8)
+    kfold[order] = np.arange(len(target)) % n_splits
+    return kfold
 
 if __name__ == "__main__":
 
@@ -49,6 +58,7 @@ if __name__ == "__main__":
     )
     df.loc[:, "target"] = y
 
-    # Call the function 'create_folds()'
-    df = create_folds(df)
-    print(df)
\ No newline at end of file
+    # Call the function 'create_folds()' with the targets only,
+    # and add the fold ids as a new column 'kfold'
+    df["kfold"] = create_folds(df.target.values)
+    print(df)
@@ -0,0 +1,96 @@
+# This shows purged and embargoed splits for data that is ordered in time.
+
+# With plain k-fold on time series, the model is trained on rows that come
+# after the validation rows, and rows next to the validation block leak
+# information into training: a target that is computed over the next days
+# overlaps the validation period, and the rows right after it are
+# correlated with it. So every fold here validates on one contiguous block
+# of time, and the training rows around it are removed:
+#   - purge: rows just before the validation block
+#   - embargo: rows just after the validation block
+# With expanding=True only rows before the validation block are used for
+# training, like sklearn's TimeSeriesSplit (walk-forward validation).
+
+# The splits are row index arrays. They can be saved next to the data with
+# 'fold_ids.save_splits', so that the training scripts read them instead
+# of recomputing them.
+
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import fold_ids
+
+
+def purged_time_series_splits(n_rows, n_splits=5, purge=0, embargo=0, expanding=False, times=None):
+    """
+    Create the training and validation rows of every fold
+    :param n_rows: number of rows
+    :param n_splits: number of folds (validation blocks)
+    :param purge: number of rows removed from training before every block
+    :param embargo: number of rows removed from training after every block
+    :param expanding: if True, only train on rows before the block
+    :param times: optional array with the time of every row. if it is not
+                  given, the rows must already be sorted in time
+    :return: list of (train_index, valid_index) numpy arrays
+    """
+    # position of every row in time
+    if times is None:
+        order = np.arange(n_rows)
+    else:
+        order = np.argsort(np.asarray(times), kind="stable")
+
+    # with expanding windows the first block is never validated,
+    # because there is nothing before it to train on
+    n_blocks = n_splits + 1 if expanding else n_splits
+    edges = np.linspace(0, n_rows, n_blocks + 1).astype(np.int64)
+
+    splits = []
+    first = n_blocks - n_splits
+    for start, stop in zip(edges[first:-1], edges[first + 1:]):
+        before = order[:max(start - purge, 0)]
+        if expanding:
+            train_index = before
+        else:
+            train_index = np.concatenate((before, order[stop + embargo:]))
+        splits.append((np.sort(train_index), np.sort(order[start:stop])))
+    return splits
+
+
+if __name__ == "__main__":
+
+    # Create a sample daily time series of 1000 days. the target of a day
+    # is the mean of the next 5 days, so it overlaps the next 5 rows
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=1000, freq="D"),
+        "value": rng.normal(size=1000).cumsum(),
+    })
+    df["target"] = df.value[::-1].rolling(5).mean()[::-1].shift(-1)
+
+    # purge the 5 rows whose targets overlap every validation block,
+    # and leave 5 more rows out after it
+    splits = purged_time_series_splits(
+        len(df), n_splits=5, purge=5, embargo=5, times=df.date.values)
+
+    for fold, (trn_, val_) in enumerate(splits):
+        print('fold: ', fold)
+        print('trn_: ', trn_)
+        print('val_: ', val_)
+
+    # Walk-forward splits, training only on the past
+    for fold, (trn_, val_) in enumerate(purged_time_series_splits(len(df), expanding=True, purge=5)):
+        print(f"fold {fold}: train {trn_.min()}-{trn_.max()}, valid {val_.min()}-{val_.max()}")
+
+    # Save the splits next to the data, for the training scripts. the
+    # sample data is written to a temporary folder, not next to this script
+    path = os.path.join(tempfile.mkdtemp(), "time_series_train.csv")
+    df.to_csv(path, index=False)
+    print(fold_ids.save_splits(splits, path))
+
+    # The training scripts read them back with 'fold_ids.load_splits'
+    assert all(
+        np.array_equal(trn_, loaded_trn) and np.array_equal(val_, loaded_val)
+        for (trn_, val_), (loaded_trn, loaded_val) in zip(splits, fold_ids.load_splits(path)))
@@ -0,0 +1,343 @@
+# This script benchmarks the metric functions in 'evaluation-metrics'
+# on synthetic data of growing size, and compares them with sklearn.
+# Where sklearn has no such metric (precision at k, MAP@k), the batched
+# numpy functions are compared with the pure python loops of the same
+# script instead.
+
+# For every metric and every input size, it records:
+#   - the wall time of the calculation
+#   - the peak memory allocated during the calculation (numpy arrays
+#     are tracked by tracemalloc, so this includes them). tracemalloc
+#     makes the code slower, so this is measured on a second call
+#   - the absolute difference from the value of the reference (for
+#     matrices like the confusion matrix, the largest difference)
+
+# The results are written as one JSON object per line, so that runs can
+# be compared with each other and slow-downs are easy to catch.
+
+# Example:
+#   python benchmark_metrics.py --sizes 1e3,1e4,1e5,1e6 --output bench.jsonl
+
+# Some of the metric scripts still loop over the samples in pure python.
+# Those are only benchmarked up to '--max_loop_rows' rows, because at
+# 1e8 rows a single call would take a very long time. The same limit
+# applies when such a loop is the reference of another metric.
+
+# The ranking data has 10 predictions per sample, so it is much larger
+# than the other kinds for the same number of rows (1e8 samples would
+# need several GB). It is only created up to '--max_ranking_rows' samples.
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+import tracemalloc
+
+import numpy as np
+from sklearn import metrics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BINARY_DIR = os.path.join(HERE, "classification", "binary-and-multi-class-classification")
+MULTI_LABEL_DIR = os.path.join(HERE, "classification", "multi-label-classification")
+ADVANCED_DIR = os.path.join(HERE, "classification", "advanced-metrics")
+REGRESSION_DIR = os.path.join(HERE, "regression")
+
+# the scripts in the binary/multi-class folder import each other
+sys.path.insert(0, BINARY_DIR)
+
+
+def load_module(directory, name):
+    """
+    Import a metric script from its file. the folder names contain
+    dashes, so the scripts cannot be imported as normal packages
+    :param directory: folder of the script
+    :param name: file name without '.py'
+    :return: the imported module
+    """
+    spec = importlib.util.spec_from_file_location(name, os.path.join(directory, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_data(kind, n, rng):
+    """
+    Create synthetic targets and predictions
+    :param kind: type of problem
+    :param n: number of rows
+    :param rng: numpy random generator
+    :return: tuple of (y_true, y_pred)
+    """
+    if kind == "binary":
+        y_true = rng.integers(0, 2, n, dtype=np.int8)
+        y_pred = rng.integers(0, 2, n, dtype=np.int8)
+    elif kind == "scores":
+        y_true = rng.integers(0, 2, n, dtype=np.int8)
+        y_pred = np.clip(0.3 * y_true + 0.7 * rng.random(n), 0, 1)
+    elif kind == "multiclass":
+        y_true = rng.integers(0, 10, n, dtype=np.int64)
+        y_pred = np.where(rng.random(n) < 0.6, y_true, rng.integers(0, 10, n))
+    elif kind == "regression":
+        y_true = rng.random(n) * 10 + 1
+        y_pred = y_true + rng.normal(0, 1, n)
+        np.abs(y_pred, out=y_pred)
+    elif kind == "ranking":
+        # n is the number of samples; every sample has 10 ranked
+        # predictions and 0..4 actual classes out of 50. the classes fit
+        # in int8, which keeps the prediction matrix at 10 bytes per sample
+        y_pred = rng.integers(0, 50, (n, 10), dtype=np.int8)
+        lengths = rng.integers(0, 5, n)
+        indptr = np.concatenate(([0], np.cumsum(lengths)))
+        indices = rng.integers(0, 50, indptr[-1])
+        y_true = (indptr, indices)
+    else:
+        raise ValueError(f"Unknown kind: {kind}")
+    return y_true, y_pred
+
+
+def metric_suite():
+    """
+    List every metric that is benchmarked
+    :return: list of dictionaries with name, kind, the function to
+             benchmark, whether it is a pure python loop, the reference
+             (sklearn or a python loop, or None) and whether the
+             reference is a pure python loop
+    """
+    accuracy_calculation = load_module(BINARY_DIR, "accuracy_calculation")
+    tp_tn_fp_fn = load_module(BINARY_DIR, "tp_tn_fp_fn")
+    f1_score = load_module(BINARY_DIR, "f1_score")
+    tpr_fpr = load_module(BINARY_DIR, "tpr_fpr")
+    calculate_log_loss = load_module(BINARY_DIR, "calculate_log_loss")
+    multi_class_precision = load_module(BINARY_DIR, "multi_class_precision")
+    multi_class_recall = load_module(BINARY_DIR, "multi_class_recall")
+    weighted_average_f1 = load_module(BINARY_DIR, "weighted_average_f1")
+    multi_class_metrics = load_module(BINARY_DIR, "multi_class_metrics")
+    cohen_kappa_score = load_module(ADVANCED_DIR, "cohen_kappa_score")
+    precisions_at_k = load_module(MULTI_LABEL_DIR, "precisions_at_k")
+    regression = load_module(REGRESSION_DIR, "regression_error_metrics")
+    streaming = load_module(HERE, "streaming_metrics")
+
+    def streaming_accuracy(y_true, y_pred):
+        accumulator = streaming.ConfusionAccumulator(num_classes=10)
+        return accumulator.update(y_true, y_pred).result()["accuracy"]
+
+    def streaming_confusion(y_true, y_pred):
+        return streaming.ConfusionAccumulator(num_classes=10).update(y_true, y_pred).matrix
+
+    def sklearn_average(function, average):
+        return lambda y_true, y_pred: function(y_true, y_pred, average=average)
+
+    def sklearn_qwk(y_true, y_pred):
+        return metrics.cohen_kappa_score(y_true, y_pred, weights="quadratic")
+
+    # the loops of 'precisions_at_k' work on lists of lists, so the ranking
+    # data is converted first (this is part of their measured time)
+    def to_lists(y_true, y_pred):
+        indptr, indices = y_true
+        true_lists = [indices[start:stop].tolist() for start, stop in zip(indptr[:-1], indptr[1:])]
+        return true_lists, y_pred.tolist()
+
+    def loop_mean_pk(y_true, y_pred, k=10):
+        true_lists, pred_lists = to_lists(y_true, y_pred)
+        values = [precisions_at_k.calculate_pk(t, p, k) for t, p in zip(true_lists, pred_lists)]
+        return sum(values) / len(values)
+
+    def loop_mean_apk(y_true, y_pred, k=10):
+        true_lists, pred_lists = to_lists(y_true, y_pred)
+        values = [precisions_at_k.calculate_apk(t, p, k) for t, p in zip(true_lists, pred_lists)]
+        return sum(values) / len(values)
+
+    def loop_mapk(y_true, y_pred, k=10):
+        return precisions_at_k.calculate_mapk(*to_lists(y_true, y_pred), k=k)
+
+    def batched_mean_pk(y_true, y_pred):
+        pk, _ = precisions_at_k.batched_precisions_at_k(y_pred, *y_true)
+        return pk[:, -1].mean()
+
+    suite = [
+        ("calculate_accuracy", "binary", accuracy_calculation.calculate_accuracy,
+         metrics.accuracy_score, True, False),
+        ("calculate_accuracy_v2", "binary", tp_tn_fp_fn.calculate_accuracy_v2,
+         metrics.accuracy_score, False, False),
+        ("calculate_precision", "binary", tp_tn_fp_fn.calculate_precision,
+         metrics.precision_score, False, False),
+        ("calculate_recall", "binary", tp_tn_fp_fn.calculate_recall,
+         metrics.recall_score, False, False),
+        ("tp_tn_fp_fn.calculate_f1", "binary", tp_tn_fp_fn.calculate_f1,
+         metrics.f1_score, False, False),
+        ("f1_score.calculate_f1", "binary", f1_score.calculate_f1,
+         metrics.f1_score, True, False),
+        ("calculate_auc", "scores", tpr_fpr.calculate_auc,
+         metrics.roc_auc_score, False, False),
+        ("calculate_log_loss", "scores", calculate_log_loss.calculate_log_loss,
+         metrics.log_loss, False, False),
+        ("macro_precision", "multiclass", multi_class_precision.macro_precision,
+         sklearn_average(metrics.precision_score, "macro"), False, False),
+        ("micro_precision", "multiclass", multi_class_precision.micro_precision,
+         sklearn_average(metrics.precision_score, "micro"), False, False),
+        ("weighted_precision", "multiclass", multi_class_precision.weighted_precision,
+         sklearn_average(metrics.precision_score, "weighted"), False, False),
+        ("macro_recall", "multiclass", multi_class_recall.macro_recall,
+         sklearn_average(metrics.recall_score, "macro"), False, False),
+        ("micro_recall", "multiclass", multi_class_recall.micro_recall,
+         sklearn_average(metrics.recall_score, "micro"), False, False),
+        ("weighted_recall", "multiclass", multi_class_recall.weighted_recall,
+         sklearn_average(metrics.recall_score, "weighted"), False, False),
+        ("weighted_f1", "multiclass", weighted_average_f1.weighted_f1,
+         sklearn_average(metrics.f1_score, "weighted"), False, False),
+        ("ConfusionAccumulator.accuracy", "multiclass", streaming_accuracy,
+         metrics.accuracy_score, False, False),
+        ("mean_absolute_error", "regression", regression.mean_absolute_error,
+         metrics.mean_absolute_error, False, False),
+        ("mean_squared_error", "regression", regression.mean_squared_error,
+         metrics.mean_squared_error, False, False),
+        ("mean_squared_log_error", "regression", regression.mean_squared_log_error,
+         metrics.mean_squared_log_error, False, False),
+        ("root_mean_squared_log_error", "regression", regression.root_mean_squared_log_error,
+         metrics.root_mean_squared_log_error, False, False),
+        ("mean_percentage_error", "regression", regression.mean_percentage_error,
+         None, False, False),
+        ("mean_absolute_percentage_error", "regression",
+         regression.mean_absolute_percentage_error,
+         metrics.mean_absolute_percentage_error, False, False),
+        ("r_squared", "regression", regression.r_squared, metrics.r2_score, False, False),
+        ("regression_report", "regression",
+         lambda y_true, y_pred: regression.regression_report(y_true, y_pred)["r_squared"],
+         metrics.r2_score, False, False),
+        ("confusion_matrix", "multiclass", multi_class_metrics.confusion_matrix,
+         metrics.confusion_matrix, False, False),
+        ("ConfusionAccumulator.confusion", "multiclass", streaming_confusion,
+         metrics.confusion_matrix, False, False),
+        ("quadratic_weighted_kappa", "multiclass", cohen_kappa_score.quadratic_weighted_kappa,
+         sklearn_qwk, False, False),
+        ("calculate_pk@10", "ranking", loop_mean_pk, None, True, False),
+        ("calculate_apk@10", "ranking", loop_mean_apk, None, True, False),
+        ("calculate_mapk@10", "ranking", loop_mapk, None, True, False),
+        ("batched_precisions_at_k@10", "ranking", batched_mean_pk,
+         loop_mean_pk, False, True),
+        ("batched_mapk@10", "ranking",
+         lambda y_true, y_pred: precisions_at_k.batched_mapk(y_pred, *y_true)[-1],
+         loop_mapk, False, True),
+    ]
+
+    return [
+        {"name": name, "kind": kind, "function": function, "reference": reference,
+         "python_loop": python_loop, "reference_loop": reference_loop}
+        for name, kind, function, reference, python_loop, reference_loop in suite
+    ]
+
+
+def measure(function, y_true, y_pred, trace_memory=True):
+    """
+    Call a metric function and measure it
+    :param function: metric function
+    :param y_true: targets
+    :param y_pred: predictions
+    :param trace_memory: if True, call the function a second time to
+                         measure its peak memory
+    :return: tuple of (value, wall time in seconds, peak memory in bytes
+             or None). the value is a float, or a numpy array for matrices
+    """
+    # tracemalloc slows down every allocation (python loops up to ~10
+    # times), so the time is measured on a call without it, and the
+    # peak memory on a separate call
+    start = time.perf_counter()
+    value = function(y_true, y_pred)
+    elapsed = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        function(y_true, y_pred)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    value = np.asarray(value, dtype=np.float64)
+    return (float(value) if value.ndim == 0 else value), elapsed, peak
+
+
+def to_json(value):
+    """
+    :param value: float or numpy array from 'measure'
+    :return: value that can be written as JSON
+    """
+    return value.tolist() if isinstance(value, np.ndarray) else value
+
+
+def run(sizes, output, max_loop_rows, max_ranking_rows, seed):
+    """
+    Run the benchmark for all metrics and sizes
+    :param sizes: list of numbers of rows
+    :param output: path of the JSON lines report
+    :param max_loop_rows: largest size for pure python loop metrics and references
+    :param max_ranking_rows: largest size for the ranking metrics
+    :param seed: random seed for the synthetic data
+    """
+    suite = metric_suite()
+    kinds = sorted({entry["kind"] for entry in suite})
+    max_rows = {"ranking": max_ranking_rows}
+
+    with open(output, "w") as f:
+        for n in sizes:
+            for kind in kinds:
+                if n > max_rows.get(kind, n):
+                    continue
+                entries = [
+                    entry for entry in suite
+                    if entry["kind"] == kind and not (entry["python_loop"] and n > max_loop_rows)
+                ]
+                if not entries:
+                    continue
+
+                # create the data once per size and kind, and share it
+                rng = np.random.default_rng(seed)
+                y_true, y_pred = make_data(kind, n, rng)
+
+                for entry in entries:
+                    value, elapsed, peak = measure(entry["function"], y_true, y_pred)
+
+                    record = {
+                        "metric": entry["name"],
+                        "rows": n,
+                        "seconds": elapsed,
+                        "peak_bytes": peak,
+                        "value": to_json(value),
+                    }
+
+                    reference_function = entry["reference"]
+                    if entry["reference_loop"] and n > max_loop_rows:
+                        reference_function = None
+
+                    if reference_function is not None:
+                        reference, reference_seconds, _ = measure(
+                            reference_function, y_true, y_pred, trace_memory=False)
+                        record["reference_value"] = to_json(reference)
+                        record["reference_seconds"] = reference_seconds
+                        record["abs_diff"] = float(np.max(np.abs(value - reference)))
+
+                    f.write(json.dumps(record) + "\n")
+                    f.flush()
+                    print(f"{entry['name']:<32} rows={n:<11} "
+                          f"time={elapsed:.4f}s peak={peak / 1e6:.1f}MB "
+                          f"diff={record.get('abs_diff', 'n/a')}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="1e3,1e4,1e5,1e6,1e7,1e8")
+    parser.add_argument("--output", type=str, default="metric_benchmark.jsonl")
+    parser.add_argument("--max_loop_rows", type=float, default=1e6)
+    parser.add_argument("--max_ranking_rows", type=float, default=1e7)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run(
+        sizes=[int(float(s)) for s in args.sizes.split(",")],
+        output=args.output,
+        max_loop_rows=args.max_loop_rows,
+        max_ranking_rows=args.max_ranking_rows,
+        seed=args.seed,
+    )
@@ -0,0 +1,226 @@
+# This script calculates bootstrap confidence intervals for AUC,
+# F1 score and quadratic weighted kappa.
+
+# The naive way to bootstrap a metric is to draw n row indices with
+# replacement, build the resampled y_true / y_pred and score them again,
+# thousands of times. That repeats the sort for AUC every time.
+
+# But all these metrics only depend on how many samples fall into a
+# small number of 'cells':
+#   - F1: the 4 cells of the binary confusion matrix
+#   - kappa: the K x K cells of the confusion matrix
+#   - AUC: (distinct score, label) pairs. the scores are sorted only one
+#     time here, and this sorted structure is reused by every replicate
+# Drawing n rows with replacement gives cell counts that follow a
+# multinomial distribution with the cell sizes / n as probabilities.
+# So a whole batch of replicates is one call to rng.multinomial, and every
+# metric is calculated from the counts with numpy, for all replicates at once.
+# Batches of replicates are spread over a process pool with independent seeds.
+
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn import metrics
+
+# maximum number of cells x replicates that are held in memory at a time
+MAX_BATCH_CELLS = 10_000_000
+
+
+def auc_cells(y_true, y_score):
+    """
+    Sort the scores one time and count negatives and positives
+    for every distinct score
+    :param y_true: list of true values (0 or 1)
+    :param y_score: list of predicted probabilities
+    :return: array of shape (n_distinct_scores, 2), sorted by score,
+             with the count of negatives in column 0 and positives in column 1
+    """
+    y_true = np.asarray(y_true)
+    _, group = np.unique(np.asarray(y_score), return_inverse=True)
+    return np.bincount(
+        2 * group.ravel() + (y_true == 1), minlength=2 * (group.max() + 1)
+    ).reshape(-1, 2)
+
+def auc_statistic(counts):
+    """
+    Calculate AUC for a batch of replicates from their cell counts.
+    AUC is the probability that a random positive has a higher score
+    than a random negative, where ties count as one half
+    :param counts: array of shape (n_replicates, n_cells)
+    :return: array of n_replicates AUC values
+    """
+    counts = counts.reshape(len(counts), -1, 2)
+    negatives = counts[:, :, 0]
+    positives = counts[:, :, 1]
+    negatives_below = np.cumsum(negatives, axis=1) - negatives
+    pairs = (positives * (negatives_below + 0.5 * negatives)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pairs / (positives.sum(axis=1) * negatives.sum(axis=1))
+
+def confusion_cells(y_true, y_pred, num_classes):
+    """
+    Count the samples in every cell of the confusion matrix
+    :param y_true: list of true classes 0..num_classes-1
+    :param y_pred: list of predicted classes 0..num_classes-1
+    :param num_classes: number of classes
+    :return: flat array of num_classes * num_classes counts
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(y_true * num_classes + y_pred, minlength=num_classes ** 2)
+
+def f1_statistic(counts):
+    """
+    Calculate the binary F1 score for a batch of replicates
+    :param counts: array of shape (n_replicates, 4) with tn, fp, fn, tp
+    :return: array of n_replicates F1 values
+    """
+    tn, fp, fn, tp = counts.T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 2 * tp / (2 * tp + fp + fn)
+
+def kappa_statistic(counts, num_classes):
+    """
+    Calculate quadratic weighted kappa for a batch of replicates
+    :param counts: array of shape (n_replicates, num_classes ** 2)
+    :param num_classes: number of classes
+    :return: array of n_replicates kappa values
+    """
+    observed = counts.reshape(len(counts), num_classes, num_classes).astype(np.float64)
+    classes = np.arange(num_classes)
+    weights = np.square(classes[:, None] - classes[None, :]) / (num_classes - 1) ** 2
+
+    # expected matrix if ratings were independent: outer
+    # product of the row and column histograms over n
+    rows = observed.sum(axis=2)
+    cols = observed.sum(axis=1)
+    expected = rows[:, :, None] * cols[:, None, :] / observed.sum(axis=(1, 2))[:, None, None]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 1 - (weights * observed).sum(axis=(1, 2)) / (weights * expected).sum(axis=(1, 2))
+
+
+def _replicates(cells, statistic, n_replicates, seed):
+    """
+    Draw bootstrap replicates of the cell counts and score them.
+    this is run inside the worker processes
+    :param cells: counts of the original data in every cell
+    :param statistic: function from (replicates, cells) counts to values
+    :param n_replicates: number of replicates for this worker
+    :param seed: seed sequence of this worker
+    :return: array of n_replicates metric values
+    """
+    rng = np.random.default_rng(seed)
+    n = int(cells.sum())
+    probabilities = cells / n
+    batch = max(1, MAX_BATCH_CELLS // len(cells))
+
+    values = []
+    for start in range(0, n_replicates, batch):
+        size = min(batch, n_replicates - start)
+        values.append(statistic(rng.multinomial(n, probabilities, size=size)))
+    return np.concatenate(values)
+
+def bootstrap(cells, statistic, n_bootstraps=1000, alpha=0.05, n_jobs=1, seed=42):
+    """
+    Calculate a metric and its bootstrap confidence interval
+    :param cells: counts of the original data in every cell
+    :param statistic: function from (replicates, cells) counts to values.
+                      it has to be a module level function (or a partial
+                      of one) so that it can be sent to worker processes
+    :param n_bootstraps: number of bootstrap replicates
+    :param alpha: the interval covers 1 - alpha of the replicates
+    :param n_jobs: number of worker processes
+    :param seed: random seed
+    :return: tuple of (value, lower bound, upper bound)
+    """
+    cells = np.asarray(cells)
+    value = float(statistic(cells[None, :])[0])
+
+    # give every worker its own part of the replicates and
+    # an independent random stream
+    seeds = np.random.SeedSequence(seed).spawn(n_jobs)
+    sizes = [len(part) for part in np.array_split(np.arange(n_bootstraps), n_jobs)]
+
+    if n_jobs == 1:
+        values = _replicates(cells, statistic, n_bootstraps, seeds[0])
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            parts = executor.map(
+                _replicates,
+                [cells] * n_jobs, [statistic] * n_jobs, sizes, seeds)
+            values = np.concatenate(list(parts))
+
+    # replicates without positives or negatives have no defined value
+    lower, upper = np.nanpercentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return value, float(lower), float(upper)
+
+
+def bootstrap_auc(y_true, y_score, **kwargs):
+    """
+    Bootstrap confidence interval of AUC
+    :param y_true: list of true values (0 or 1)
+    :param y_score: list of predicted probabilities
+    :param kwargs: arguments of 'bootstrap'
+    :return: tuple of (auc, lower bound, upper bound)
+    """
+    return bootstrap(auc_cells(y_true, y_score).ravel(), auc_statistic, **kwargs)
+
+def bootstrap_f1(y_true, y_pred, **kwargs):
+    """
+    Bootstrap confidence interval of the binary F1 score
+    :param y_true: list of true values (0 or 1)
+    :param y_pred: list of predicted values (0 or 1)
+    :param kwargs: arguments of 'bootstrap'
+    :return: tuple of (f1, lower bound, upper bound)
+    """
+    return bootstrap(confusion_cells(y_true, y_pred, 2), f1_statistic, **kwargs)
+
+def bootstrap_kappa(y_true, y_pred, **kwargs):
+    """
+    Bootstrap confidence interval of quadratic weighted kappa
+    :param y_true: list of true ratings
+    :param y_pred: list of predicted ratings
+    :param kwargs: arguments of 'bootstrap'
+    :return: tuple of (kappa, lower bound, upper bound)
+    """
+
+    # map the ratings to 0..num_classes-1, keeping their order
+    classes, encoded = np.unique(
+        np.concatenate((np.asarray(y_true), np.asarray(y_pred))), return_inverse=True)
+    n = len(y_true)
+    num_classes = len(classes)
+    cells = confusion_cells(encoded[:n], encoded[n:], num_classes)
+    return bootstrap(cells, partial(kappa_statistic, num_classes=num_classes), **kwargs)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_bootstraps", type=int, default=2000)
+    parser.add_argument("--n_jobs", type=int, default=2)
+    args = parser.parse_args()
+
+    # synthetic predictions
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 100_000)
+    y_score = np.round(np.clip(0.3 * y_true + 0.7 * rng.random(len(y_true)), 0, 1), 4)
+    y_pred = (y_score >= 0.5).astype(int)
+
+    auc = bootstrap_auc(y_true, y_score, n_bootstraps=args.n_bootstraps, n_jobs=args.n_jobs)
+    print('AUC and 95% interval: ', auc)
+    print('Sklearn AUC: ', metrics.roc_auc_score(y_true, y_score), '\n')
+
+    f1 = bootstrap_f1(y_true, y_pred, n_bootstraps=args.n_bootstraps, n_jobs=args.n_jobs)
+    print('F1 and 95% interval: ', f1)
+    print('Sklearn F1: ', metrics.f1_score(y_true, y_pred), '\n')
+
+    ratings_true = [1, 2, 3, 1, 2, 3, 1, 2, 3]
+    ratings_pred = [2, 1, 3, 1, 2, 3, 3, 1, 2]
+    kappa = bootstrap_kappa(
+        ratings_true, ratings_pred, n_bootstraps=args.n_bootstraps, n_jobs=args.n_jobs)
+    print('QWK and 95% interval: ', kappa)
+    print('Sklearn QWK: ', metrics.cohen_kappa_score(
+        ratings_true, ratings_pred, weights="quadratic"))
@@ -4,8 +4,132 @@
 # We can see that even though accuracy is high, QWK is less.
 # A QWK of 0.85 or higher is considered as very good.
 
+# It also implements quadratic weighted kappa (QWK) natively. QWK is often
+# used as the objective when searching the thresholds that round continuous
+# predictions to ordinal ratings, which means thousands of QWK calculations
+# on the same predictions. 'ThresholdKappa' sorts the predictions once and
+# keeps a cumulative count of every true rating along the sorted predictions.
+# Moving a threshold then only changes two columns of the confusion matrix,
+# which are read from the cumulative counts, so every probe costs
+# O(classes^2) for the kappa itself instead of another pass over the data.
+
+import numpy as np
 from sklearn import metrics
 
+def quadratic_weighted_kappa_from_confusion(confusion):
+    """
+    Function to calculate quadratic weighted kappa from a confusion matrix
+    :param confusion: confusion matrix, rows are true ratings
+                      and columns are predicted ratings
+    :return: quadratic weighted kappa
+    """
+    confusion = np.asarray(confusion, dtype=np.float64)
+    num_classes = len(confusion)
+
+    # the further apart two ratings are, the larger the weight
+    classes = np.arange(num_classes)
+    weights = np.square(classes[:, None] - classes[None, :]) / (num_classes - 1) ** 2
+
+    # expected confusion matrix if the two ratings were independent
+    expected = np.outer(confusion.sum(axis=1), confusion.sum(axis=0)) / confusion.sum()
+
+    return 1 - (weights * confusion).sum() / (weights * expected).sum()
+
+def quadratic_weighted_kappa(y_true, y_pred):
+    """
+    Function to calculate quadratic weighted kappa
+    :param y_true: list of true ratings
+    :param y_pred: list of predicted ratings
+    :return: quadratic weighted kappa
+    """
+
+    # map all ratings to 0..num_classes-1, keeping their order
+    classes, encoded = np.unique(
+        np.concatenate((np.asarray(y_true), np.asarray(y_pred))), return_inverse=True)
+    n = len(y_true)
+    num_classes = len(classes)
+
+    # build the confusion matrix with a single bincount
+    confusion = np.bincount(
+        encoded[:n] * num_classes + encoded[n:], minlength=num_classes ** 2
+    ).reshape(num_classes, num_classes)
+
+    return quadratic_weighted_kappa_from_confusion(confusion)
+
+class ThresholdKappa:
+    """
+    Quadratic weighted kappa for continuous predictions that are rounded
+    to ratings with a list of thresholds. a prediction gets rating i when
+    thresholds[i - 1] <= prediction < thresholds[i], like np.digitize
+    """
+
+    def __init__(self, y_true, y_score, thresholds):
+        """
+        :param y_true: list of true ratings
+        :param y_score: list of continuous predictions
+        :param thresholds: sorted list of num_classes - 1 thresholds
+        """
+        self.classes, y_true = np.unique(np.asarray(y_true), return_inverse=True)
+        num_classes = len(self.classes)
+        if len(thresholds) != num_classes - 1:
+            raise ValueError("Number of thresholds must be the number of ratings - 1")
+
+        # sort the predictions once
+        order = np.argsort(np.asarray(y_score), kind="mergesort")
+        self.sorted_scores = np.asarray(y_score, dtype=np.float64)[order]
+        sorted_true = y_true.ravel()[order]
+
+        # cumulative[c, i] is the number of samples with true rating c
+        # among the i smallest predictions
+        n = len(sorted_true)
+        dtype = np.int32 if n < 2 ** 31 else np.int64
+        self.cumulative = np.zeros((num_classes, n + 1), dtype=dtype)
+        for c in range(num_classes):
+            np.cumsum(sorted_true == c, out=self.cumulative[c, 1:])
+
+        # positions in the sorted predictions where every rating starts
+        self.thresholds = np.asarray(thresholds, dtype=np.float64).copy()
+        self.boundaries = np.concatenate(
+            ([0], np.searchsorted(self.sorted_scores, self.thresholds), [n]))
+
+        # build the full confusion matrix one time
+        self.confusion = np.diff(self.cumulative[:, self.boundaries], axis=1)
+
+    def set_threshold(self, index, value):
+        """
+        Move one threshold and update the confusion matrix
+        :param index: which threshold to move
+        :param value: new value of the threshold
+        :return: quadratic weighted kappa with the new thresholds
+        """
+        lower = self.thresholds[index - 1] if index > 0 else -np.inf
+        upper = self.thresholds[index + 1] if index + 1 < len(self.thresholds) else np.inf
+        if not lower <= value <= upper:
+            raise ValueError("Thresholds must stay sorted")
+
+        self.thresholds[index] = value
+        self.boundaries[index + 1] = np.searchsorted(self.sorted_scores, value)
+
+        # only the two ratings next to this threshold change
+        b = self.boundaries
+        self.confusion[:, index] = self.cumulative[:, b[index + 1]] - self.cumulative[:, b[index]]
+        self.confusion[:, index + 1] = self.cumulative[:, b[index + 2]] - self.cumulative[:, b[index + 1]]
+        return self.kappa()
+
+    def kappa(self):
+        """
+        :return: quadratic weighted kappa with the current thresholds
+        """
+        return quadratic_weighted_kappa_from_confusion(self.confusion)
+
+    def predict(self, y_score):
+        """
+        Round continuous predictions to ratings with the current thresholds
+        :param y_score: list of continuous predictions
+        :return: numpy array of ratings
+        """
+        return self.classes[np.digitize(y_score, self.thresholds)]
+
 if __name__ == "__main__":
 
     y_true = [1, 2, 3, 1, 2, 3, 1, 2, 3]
@@ -13,3 +137,29 @@ if __name__ == "__main__":
 
     print(metrics.cohen_kappa_score(y_true, y_pred, weights="quadratic"))
     print(metrics.accuracy_score(y_true, y_pred))
+    print(quadratic_weighted_kappa(y_true, y_pred))
+
+    # search the rounding thresholds of continuous predictions for
+    # ratings 0..4, one threshold at a time, on a grid of candidates
+    rng = np.random.default_rng(42)
+    ratings = rng.integers(0, 5, 100_000)
+    scores = ratings + rng.normal(0, 1.2, len(ratings))
+
+    kappa = ThresholdKappa(ratings, scores, [0.5, 1.5, 2.5, 3.5])
+    print('QWK with initial thresholds: ', kappa.kappa())
+
+    for _ in range(3):
+        for i in range(len(kappa.thresholds)):
+            best_value, best_kappa = kappa.thresholds[i], kappa.kappa()
+            low = kappa.thresholds[i - 1] if i > 0 else scores.min()
+            high = kappa.thresholds[i + 1] if i + 1 < len(kappa.thresholds) else scores.max()
+            for candidate in np.linspace(low, high, 100):
+                value = kappa.set_threshold(i, candidate)
+                if value > best_kappa:
+                    best_value, best_kappa = candidate, value
+            kappa.set_threshold(i, best_value)
+
+    print('Optimized thresholds: ', kappa.thresholds)
+    print('QWK with optimized thresholds: ', kappa.kappa())
+    print('Sklearn QWK with optimized thresholds: ', metrics.cohen_kappa_score(
+        ratings, kappa.predict(scores), weights="quadratic"))
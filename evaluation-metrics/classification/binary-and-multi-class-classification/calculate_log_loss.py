@@ -3,6 +3,13 @@
 
 # Log loss penalizes a lot more than other metrics.
 
+# The calculation works on whole numpy arrays. For every sample we only
+# need the probability that was given to its true class, so we gather
+# those values into one buffer, and clip, log and sum that buffer in place.
+# With 'chunk_size', the rows are processed a chunk at a time and the same
+# buffers are reused for every chunk, so even probability matrices that are
+# memory-mapped from disk never need a second full-size copy in memory.
+
 import numpy as np
 from sklearn import metrics
 
@@ -11,37 +18,101 @@ from sklearn import metrics
 # important to add or remove a very small epsilon.
 epsilon = 1e-15
 
-# empty list to store all loss values
-loss = []
-
-def calculate_log_loss(y_tr, y_prob):
+def calculate_log_loss(y_tr, y_prob, sample_weight=None, chunk_size=None):
     """
     Function to calculate log loss
-    :param y_tr: list of true values
-    :param y_prob: list of probability values
-    :return: average of all log values
+    :param y_tr: list of true values. for multi-class problems
+                 these are the class indices 0..n_classes-1
+    :param y_prob: list of probability values of the positive class, or
+                   a matrix of shape (n_samples, n_classes) with one
+                   probability per class
+    :param sample_weight: optional list of weights, one per sample
+    :param chunk_size: optional number of rows processed at a time.
+                       by default all rows are processed at once
+    :return: (weighted) average of all log values
     """
-    for yt, yp in zip(y_tr, y_prob):
+    y_tr = np.asarray(y_tr, dtype=np.int64)
+    y_prob = np.asarray(y_prob)
+    n_samples = len(y_tr)
+    if sample_weight is not None:
+        sample_weight = np.asarray(sample_weight, dtype=np.float64)
+
+    if chunk_size is None:
+        chunk_size = n_samples
+
+    # buffers that are reused for every chunk: the probabilities
+    # of the true classes, and their positions in the flat matrix
+    true_prob = np.empty(chunk_size, dtype=np.float64)
+    flat_index = np.empty(chunk_size, dtype=np.int64)
+    row_number = np.arange(chunk_size, dtype=np.int64)
+
+    total_loss = 0.0
+    total_weight = 0.0
+
+    for start in range(0, n_samples, chunk_size):
+        stop = min(start + chunk_size, n_samples)
+        size = stop - start
+        labels = y_tr[start:stop]
+        probs = true_prob[:size]
+
+        if y_prob.ndim == 1:
+            # binary case: the probability of the true class is
+            # p for positive samples and 1 - p for negative ones
+            probs[:] = y_prob[start:stop]
+            np.subtract(1.0, probs, out=probs, where=labels == 0)
+        else:
+            # multi-class case: pick column 'label' of every row.
+            # the rows of the chunk are contiguous, so we can index
+            # the flattened chunk at row * n_classes + label
+            n_classes = y_prob.shape[1]
+            index = flat_index[:size]
+            np.multiply(row_number[:size], n_classes, out=index)
+            index += labels
+            np.take(np.ascontiguousarray(y_prob[start:stop]).ravel(), index, out=probs)
+
+        # clip values to [epsilon, 1-epsilon] range and take the log, in place
+        np.clip(probs, epsilon, 1 - epsilon, out=probs)
+        np.log(probs, out=probs)
+
+        if sample_weight is None:
+            total_loss -= probs.sum()
+            total_weight += size
+        else:
+            weights = sample_weight[start:stop]
+            total_loss -= np.dot(weights, probs)
+            total_weight += weights.sum()
+
+    return total_loss / total_weight
+
+if __name__ == "__main__":
+
+    # lists containing targets and prediction values
+    y_true = [0, 0, 0, 0, 1, 0, 1, 0, 0, 1, 0, 1, 0, 0, 1]
+    y_proba = [0.1, 0.3, 0.2, 0.6, 0.8, 0.05, 0.9, 0.5,
+               0.3, 0.66, 0.3, 0.2, 0.85, 0.15, 0.99]
 
-        # clip values in y_proba to [epsilon, 1-epsilon] range
-        yp = np.clip(yp, epsilon, 1 - epsilon)
+    # calculate the log loss using the self-created function
+    calculated_log_loss = calculate_log_loss(y_true, y_proba)
 
-        # calculate log loss for each prediction and append all values to 'loss'
-        temp_loss = -1.0 * (yt * np.log(yp) + (1 - yt) * np.log(1 - yp))
-        loss.append(temp_loss)
-    
-    return np.mean(loss)
+    # calculate the log loss using sklearn
+    sklearn_log_loss = metrics.log_loss(y_true, y_proba)
 
-# lists containing targets and prediction values
-y_true = [0, 0, 0, 0, 1, 0, 1, 0, 0, 1, 0, 1, 0, 0, 1]
-y_proba = [0.1, 0.3, 0.2, 0.6, 0.8, 0.05, 0.9, 0.5, 
-           0.3, 0.66, 0.3, 0.2, 0.85, 0.15, 0.99]
+    print(calculated_log_loss)
+    print(sklearn_log_loss)
 
-# calculate the log loss using the self-created function
-calculated_log_loss = calculate_log_loss(y_true, y_proba)
+    # calling the function again gives the same value, because
+    # nothing is kept between calls
+    print(calculate_log_loss(y_true, y_proba, chunk_size=4))
 
-# calculate the log loss using sklearn
-sklearn_log_loss = metrics.log_loss(y_true, y_proba)
+    # multi-class probabilities with sample weights
+    y_true = [0, 1, 2, 0, 1, 2]
+    y_proba = [[0.7, 0.2, 0.1],
+               [0.1, 0.8, 0.1],
+               [0.2, 0.2, 0.6],
+               [0.3, 0.4, 0.3],
+               [0.5, 0.3, 0.2],
+               [0.0, 0.1, 0.9]]
+    weights = [1, 1, 2, 1, 0.5, 1]
 
-print(calculated_log_loss)
-print(sklearn_log_loss)
\ No newline at end of file
+    print(calculate_log_loss(y_true, y_proba, sample_weight=weights, chunk_size=4))
+    print(metrics.log_loss(y_true, y_proba, sample_weight=weights))
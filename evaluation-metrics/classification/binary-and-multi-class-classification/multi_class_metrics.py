@@ -0,0 +1,135 @@
+'''
+This script calculates precision, recall and f1 score for multi-class
+classification from a single confusion matrix.
+
+Instead of building one-vs-rest lists for every class (which means
+going over all the samples once per class), we build the full
+confusion matrix in one pass and read everything from it:
+
+    - true positives of a class are on the diagonal
+    - false positives of a class are the rest of its column
+    - false negatives of a class are the rest of its row
+
+All the averaging modes (macro, micro and weighted) then only
+need the per-class counts, which are tiny compared to the data.
+'''
+
+import numpy as np
+from sklearn import metrics
+
+def confusion_matrix(y_true, y_pred, num_classes=None):
+    """
+    Function to build a confusion matrix with a single bincount.
+    rows are actual classes and columns are predicted classes
+    :param y_true: list of true values
+    :param y_pred: list of predicted values
+    :param num_classes: number of classes, when the labels are 0..num_classes-1.
+                        if not given, the classes are the sorted labels that
+                        are seen in y_true or y_pred, like sklearn does
+    :return: numpy array of shape (num_classes, num_classes)
+    """
+    if num_classes is None:
+        # encode the labels as 0..n_labels-1, so that labels that are not
+        # contiguous (like 0, 2, 4) do not add empty classes in between
+        labels, codes = np.unique(
+            np.concatenate([np.asarray(y_true), np.asarray(y_pred)]), return_inverse=True)
+        y_true, y_pred = codes[:len(y_true)], codes[len(y_true):]
+        num_classes = len(labels)
+
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+
+    # a label outside 0..num_classes-1 would be counted in a wrong cell
+    for name, labels in (("y_true", y_true), ("y_pred", y_pred)):
+        if labels.size and (labels.min() < 0 or labels.max() >= num_classes):
+            raise ValueError(f"{name} has labels outside 0..{num_classes - 1}")
+
+    # give every (actual, predicted) pair its own cell index and
+    # count how many samples fall into every cell
+    codes = y_true * num_classes + y_pred
+    counts = np.bincount(codes, minlength=num_classes * num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+def class_counts(cm):
+    """
+    Function to read per-class counts from a confusion matrix
+    :param cm: confusion matrix from 'confusion_matrix'
+    :return: tuple of arrays (tp, fp, fn, support) with one value per class
+    """
+    tp = np.diag(cm)
+    fp = cm.sum(axis=0) - tp
+    fn = cm.sum(axis=1) - tp
+    support = cm.sum(axis=1)
+    return tp, fp, fn, support
+
+def _divide(numerator, denominator):
+    """
+    Divide and return 0 wherever the denominator is 0, like sklearn does
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+def precision_recall_f1(y_true, y_pred, average="macro", num_classes=None):
+    """
+    Function to calculate precision, recall and f1 score together
+    :param y_true: list of true values
+    :param y_pred: list of predicted values
+    :param average: "macro", "micro" or "weighted"
+    :param num_classes: optional number of classes, when the labels are
+                        0..num_classes-1. by default the averages are over
+                        the labels that are seen in y_true or y_pred
+    :return: tuple of (precision, recall, f1)
+    """
+    tp, fp, fn, support = class_counts(
+        confusion_matrix(y_true, y_pred, num_classes))
+
+    if average == "micro":
+        # sum the counts over all classes first,
+        # then calculate the metrics one time
+        tp, fp, fn = tp.sum(), fp.sum(), fn.sum()
+        precision = _divide(tp, tp + fp)
+        recall = _divide(tp, tp + fn)
+        f1 = _divide(2 * tp, 2 * tp + fp + fn)
+        return float(precision), float(recall), float(f1)
+
+    precision = _divide(tp, tp + fp)
+    recall = _divide(tp, tp + fn)
+    f1 = _divide(2 * tp, 2 * tp + fp + fn)
+
+    if average == "macro":
+        weights = np.ones_like(support)
+    elif average == "weighted":
+        weights = support
+    else:
+        raise ValueError(f"Unknown average: {average}")
+
+    return (
+        float(np.average(precision, weights=weights)),
+        float(np.average(recall, weights=weights)),
+        float(np.average(f1, weights=weights)),
+    )
+
+if __name__ == "__main__":
+
+    y_true = [0, 1, 2, 0, 1, 2, 0, 2, 2]
+    y_pred = [0, 2, 1, 0, 2, 1, 0, 0, 2]
+
+    # calculate every averaging mode and compare it with sklearn
+    for average in ["macro", "micro", "weighted"]:
+        p, r, f1 = precision_recall_f1(y_true, y_pred, average=average)
+        print(f'Calculated {average} precision, recall, f1: ', p, r, f1)
+        print(f'Sklearn {average} precision, recall, f1: ',
+              metrics.precision_score(y_true, y_pred, average=average),
+              metrics.recall_score(y_true, y_pred, average=average),
+              metrics.f1_score(y_true, y_pred, average=average), '\n')
+
+    # labels do not have to be 0..K-1: only the labels that are seen count
+    y_true = [0, 2, 2, 0, 4]
+    y_pred = [0, 2, 0, 0, 4]
+    print('Calculated macro with labels 0, 2, 4: ', precision_recall_f1(y_true, y_pred))
+    print('Sklearn macro with labels 0, 2, 4: ',
+          metrics.precision_score(y_true, y_pred, average="macro"),
+          metrics.recall_score(y_true, y_pred, average="macro"),
+          metrics.f1_score(y_true, y_pred, average="macro"))
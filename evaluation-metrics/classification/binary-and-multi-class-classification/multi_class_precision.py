@@ -15,49 +15,11 @@ for multi-class classification:
     average depending on the number of items in each class
 '''
 
-import numpy as np
-from collections import Counter
 from sklearn import metrics
 
-def true_positive(y_true, y_pred):
-    """
-    Function to calculate True Positives
-    :param y_true: list of true values
-    :param y_pred: list of predicted values
-    :return: number of True Positives
-    """
-
-    # Initialize the number of True Positives to 0
-    tp = 0
-
-    # Loop through all list entries and increment tp counter
-    # for every true positive entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 1 and yp == 1:
-            tp += 1
-
-    # Return the number of true positives
-    return tp
-
-def false_positive(y_true, y_pred):
-    """
-    Function to calculate False Positives
-    :param y_true: list of true values
-    :param y_pred: list of predicted values
-    :return: number of False Positives
-    """
-
-    # Initialize the number of False Positives to 0
-    fp = 0
-
-    # Loop through all list entries and increment fp counter
-    # for every false positive entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 0 and yp == 1:
-            fp += 1
-
-    # Return the number of false positives
-    return fp
+# all the counts are read from one confusion matrix
+# that is built in a single pass over the data
+from multi_class_metrics import precision_recall_f1
 
 def macro_precision(y_true, y_pred):
     """
@@ -67,31 +29,9 @@ def macro_precision(y_true, y_pred):
     :return: macro precision score
     """
 
-    # find the number of classes and 
-    # initialize precision to 0
-    num_classes = len(np.unique(y_true))
-    precision = 0
-    
-    for class_ in range(num_classes):
-
-        # consider all classes except the current class 
-        # as negative, so set all other classes to 0
-        temp_true = [1 if p == class_ else 0 for p in y_true]
-        temp_pred = [1 if p == class_ else 0 for p in y_pred]
-
-        # calculate true positive and true negative for current class
-        tp = true_positive(temp_true, temp_pred)
-        fp = false_positive(temp_true, temp_pred)
-
-        # calculate precision for current class
-        temp_precision = tp / (tp + fp)
-
-        # keep adding precision for all classes
-        precision += temp_precision
-
-    # calculate and return average precision over all classes
-    precision /= num_classes
-    return precision
+    # calculate precision for every class from the confusion
+    # matrix and take the plain average over classes
+    return precision_recall_f1(y_true, y_pred, average="macro")[0]
 
 def micro_precision(y_true, y_pred):
     """
@@ -101,30 +41,11 @@ def micro_precision(y_true, y_pred):
     :return: micro precision score
     """
 
-    # find the number of classes and initialize
-    # total tp and total fp variables to 0
-    num_classes = len(np.unique(y_true))
-    tp = 0
-    fp = 0
-
-    for class_ in range(num_classes):
-
-        # consider all classes except the current class 
-        # as negative, so set all other classes to 0
-        temp_true = [1 if p == class_ else 0 for p in y_true]
-        temp_pred = [1 if p == class_ else 0 for p in y_pred]
-        
-        # calculate tp and fp for current class and 
-        # update the over tp and fp variables
-        tp += true_positive(temp_true, temp_pred)
-        fp += false_positive(temp_true, temp_pred)
-
-    # calculate and return overall precision
-    precision = tp / (tp + fp)
-    return precision
+    # add up tp, fp and fn over all classes and
+    # then calculate the overall precision one time
+    return precision_recall_f1(y_true, y_pred, average="micro")[0]
 
 def weighted_precision(y_true, y_pred):
-
     """
     Function to calculate weighted averaged precision
     :param y_true: list of true values
@@ -132,41 +53,9 @@ def weighted_precision(y_true, y_pred):
     :return: weighted precision score
     """
 
-    # find the number of classes
-    num_classes = len(np.unique(y_true))
-
-    # create class:sample count dictionary, which
-    # looks something like this:
-    # {0: 20, 1:15, 2:21}
-    class_counts = Counter(y_true)
-
-    # initialize precision to 0
-    precision = 0
-
-    for class_ in range(num_classes):
-
-        # consider all classes except the current class 
-        # as negative, so set all other classes to 0
-        temp_true = [1 if p == class_ else 0 for p in y_true]
-        temp_pred = [1 if p == class_ else 0 for p in y_pred]
-
-        # calculate tp and fp for current class
-        tp = true_positive(temp_true, temp_pred)
-        fp = false_positive(temp_true, temp_pred)
-
-        # calculate precision of class
-        temp_precision = tp / (tp + fp)
-
-        # multiply precision with count of samples in class
-        weighted_precision = class_counts[class_] * temp_precision
-
-        # add to overall precision
-        precision += weighted_precision
-
-    # calculate overall precision by dividing
-    # by the total number of samples
-    overall_precision = precision / len(y_true)
-    return overall_precision
+    # calculate precision for every class and average them,
+    # weighted by the number of samples in every class
+    return precision_recall_f1(y_true, y_pred, average="weighted")[0]
 
 if __name__ == "__main__":
     
@@ -15,49 +15,11 @@ for multi-class classification:
     average depending on the number of items in each class
 '''
 
-import numpy as np
-from collections import Counter
 from sklearn import metrics
 
-def true_positive(y_true, y_pred):
-    """
-    Function to calculate True Positives
-    :param y_true: list of true values
-    :param y_pred: list of predicted values
-    :return: number of True Positives
-    """
-
-    # Initialize the number of True Positives to 0
-    tp = 0
-
-    # Loop through all list entries and increment tp counter
-    # for every true positive entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 1 and yp == 1:
-            tp += 1
-
-    # Return the number of true positives
-    return tp
-
-def false_negative(y_true, y_pred):
-    """
-    Function to calculate False Negatives
-    :param y_true: list of true values
-    :param y_pred: list of predicted values
-    :return: number of False Negatives
-    """
-
-    # Initialize the number of False Neagtives to 0
-    fn = 0
-
-    # Loop through all list entries and increment tn counter
-    # for every false negative entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 1 and yp == 0:
-            fn += 1
-
-    # Return the number of false negatives
-    return fn
+# all the counts are read from one confusion matrix
+# that is built in a single pass over the data
+from multi_class_metrics import precision_recall_f1
 
 def macro_recall(y_true, y_pred):
     """
@@ -67,31 +29,9 @@ def macro_recall(y_true, y_pred):
     :return: macro recall score
     """
 
-    # find the number of classes and 
-    # initialize recall to 0
-    num_classes = len(np.unique(y_true))
-    recall = 0
-    
-    for class_ in range(num_classes):
-
-        # consider all classes except the current class 
-        # as negative, so set all other classes to 0
-        temp_true = [1 if p == class_ else 0 for p in y_true]
-        temp_pred = [1 if p == class_ else 0 for p in y_pred]
-
-        # calculate true positive and false negative for current class
-        tp = true_positive(temp_true, temp_pred)
-        fn = false_negative(temp_true, temp_pred)
-
-        # calculate precision for current class
-        temp_recall = tp / (tp + fn)
-
-        # keep adding precision for all classes
-        recall += temp_recall
-
-    # calculate and return average precision over all classes
-    recall /= num_classes
-    return recall
+    # calculate recall for every class from the confusion
+    # matrix and take the plain average over classes
+    return precision_recall_f1(y_true, y_pred, average="macro")[1]
 
 def micro_recall(y_true, y_pred):
     """
@@ -101,30 +41,11 @@ def micro_recall(y_true, y_pred):
     :return: micro recall score
     """
 
-    # find the number of classes and initialize
-    # total tp and total fn variables to 0
-    num_classes = len(np.unique(y_true))
-    tp = 0
-    fn = 0
-
-    for class_ in range(num_classes):
-
-        # consider all classes except the current class 
-        # as negative, so set all other classes to 0
-        temp_true = [1 if p == class_ else 0 for p in y_true]
-        temp_pred = [1 if p == class_ else 0 for p in y_pred]
-        
-        # calculate tp and fn for current class and 
-        # update the over tp and fn variables
-        tp += true_positive(temp_true, temp_pred)
-        fn += false_negative(temp_true, temp_pred)
-
-    # calculate and return overall precision
-    recall = tp / (tp + fn)
-    return recall
+    # add up tp, fp and fn over all classes and
+    # then calculate the overall recall one time
+    return precision_recall_f1(y_true, y_pred, average="micro")[1]
 
 def weighted_recall(y_true, y_pred):
-
     """
     Function to calculate weighted averaged recall
     :param y_true: list of true values
@@ -132,41 +53,9 @@ def weighted_recall(y_true, y_pred):
     :return: weighted recall score
     """
 
-    # find the number of classes
-    num_classes = len(np.unique(y_true))
-
-    # create class:sample count dictionary, which
-    # looks something like this:
-    # {0: 20, 1:15, 2:21}
-    class_counts = Counter(y_true)
-
-    # initialize precision to 0
-    recall = 0
-
-    for class_ in range(num_classes):
-
-        # consider all classes except the current class 
-        # as negative, so set all other classes to 0
-        temp_true = [1 if p == class_ else 0 for p in y_true]
-        temp_pred = [1 if p == class_ else 0 for p in y_pred]
-
-        # calculate tp and fn for current class
-        tp = true_positive(temp_true, temp_pred)
-        fn = false_negative(temp_true, temp_pred)
-
-        # calculate precision of class
-        temp_recall = tp / (tp + fn)
-
-        # multiply precision with count of samples in class
-        weighted_recall = class_counts[class_] * temp_recall
-
-        # add to overall precision
-        recall += weighted_recall
-
-    # calculate overall precision by dividing
-    # by the total number of samples
-    overall_recall = recall / len(y_true)
-    return overall_recall
+    # calculate recall for every class and average them,
+    # weighted by the number of samples in every class
+    return precision_recall_f1(y_true, y_pred, average="weighted")[1]
 
 if __name__ == "__main__":
     
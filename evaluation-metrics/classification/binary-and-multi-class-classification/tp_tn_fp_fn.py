@@ -2,8 +2,34 @@
 # and False Negatives are calculated. And it shows how different evaluation
 # metrics, such as accuracy and precision, can be calculated using those variables.
 
+import numpy as np
 import matplotlib.pyplot as plt
 
+def confusion_counts(y_true, y_pred):
+    """
+    Function to calculate True Negatives, False Positives, False Negatives
+    and True Positives in a single vectorized pass
+    :param y_true: list or array of true values (0 or 1)
+    :param y_pred: list or array of predicted values (0 or 1)
+    :return: tuple of (tp, tn, fp, fn)
+    """
+
+    # convert the inputs to small integer arrays. if they are
+    # already numpy arrays of the right type, no copy is made
+    y_true = np.asarray(y_true, dtype=np.int8)
+    y_pred = np.asarray(y_pred, dtype=np.int8)
+
+    # encode every (target, prediction) pair as one number:
+    # 0 -> (0, 0), 1 -> (0, 1), 2 -> (1, 0), 3 -> (1, 1)
+    # and count how many times every code appears. this
+    # gives us all four counts with one pass over the data
+    codes = 2 * y_true + y_pred
+    tn, fp, fn, tp = np.bincount(codes.ravel(), minlength=4)[:4]
+
+    # return plain python integers so that divisions
+    # further down behave like they did with lists
+    return int(tp), int(tn), int(fp), int(fn)
+
 def true_positive(y_true, y_pred):
     """
     Function to calculate True Positives
@@ -11,17 +37,7 @@ def true_positive(y_true, y_pred):
     :param y_pred: list of predicted values
     :return: number of True Positives
     """
-
-    # Initialize the number of True Positives to 0
-    tp = 0
-
-    # Loop through all list entries and increment tp counter
-    # for every true positive entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 1 and yp == 1:
-            tp += 1
-
-    # Return the number of true positives
+    tp, _, _, _ = confusion_counts(y_true, y_pred)
     return tp
 
 def true_negative(y_true, y_pred):
@@ -31,17 +47,7 @@ def true_negative(y_true, y_pred):
     :param y_pred: list of predicted values
     :return: number of True Negatives
     """
-
-    # Initialize the number of True Neagtives to 0
-    tn = 0
-
-    # Loop through all list entries and increment tn counter
-    # for every true negative entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 0 and yp == 0:
-            tn += 1
-
-    # Return the number of true negatives
+    _, tn, _, _ = confusion_counts(y_true, y_pred)
     return tn
 
 def false_positive(y_true, y_pred):
@@ -51,17 +57,7 @@ def false_positive(y_true, y_pred):
     :param y_pred: list of predicted values
     :return: number of False Positives
     """
-
-    # Initialize the number of False Positives to 0
-    fp = 0
-
-    # Loop through all list entries and increment fp counter
-    # for every false positive entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 0 and yp == 1:
-            fp += 1
-
-    # Return the number of false positives
+    _, _, fp, _ = confusion_counts(y_true, y_pred)
     return fp
     
 def false_negative(y_true, y_pred):
@@ -71,17 +67,7 @@ def false_negative(y_true, y_pred):
     :param y_pred: list of predicted values
     :return: number of False Negatives
     """
-
-    # Initialize the number of False Neagtives to 0
-    fn = 0
-
-    # Loop through all list entries and increment tn counter
-    # for every false negative entry
-    for yt, yp in zip(y_true, y_pred):
-        if yt == 1 and yp == 0:
-            fn += 1
-
-    # Return the number of false negatives
+    _, _, _, fn = confusion_counts(y_true, y_pred)
     return fn
 
 
@@ -92,11 +78,7 @@ def calculate_accuracy_v2(y_true, y_pred):
     :param y_pred: predicted values
     :return: calculated accuracy
     """
-    true_p = true_positive(y_true, y_pred)
-    false_p = false_positive(y_true, y_pred)
-    true_n = true_negative(y_true, y_pred)
-    false_n = false_negative(y_true, y_pred)
-
+    true_p, true_n, false_p, false_n = confusion_counts(y_true, y_pred)
     return (true_p + true_n) / (true_p + true_n + false_p + false_n)
 
 
@@ -107,8 +89,7 @@ def calculate_precision(y_true, y_pred):
     :param y_pred: predicted values
     :return: calculated precision
     """
-    true_p = true_positive(y_true, y_pred)
-    false_p = false_positive(y_true, y_pred)
+    true_p, _, false_p, _ = confusion_counts(y_true, y_pred)
     return (true_p) / (true_p + false_p)
 
 def calculate_recall(y_true, y_pred):
@@ -118,10 +99,20 @@ def calculate_recall(y_true, y_pred):
     :param y_pred: predicted values
     :return: calculated recall
     """
-    true_p = true_positive(y_true, y_pred)
-    false_n = false_negative(y_true, y_pred)
+    true_p, _, _, false_n = confusion_counts(y_true, y_pred)
     return (true_p) / (true_p + false_n)
 
+def calculate_f1(y_true, y_pred):
+    """
+    Function to calculate f1 score from targets and predictions.
+    precision and recall are both read from the same confusion counts
+    :param y_true: target values
+    :param y_pred: predicted values
+    :return: calculated f1 score
+    """
+    true_p, _, false_p, false_n = confusion_counts(y_true, y_pred)
+    return 2 * true_p / (2 * true_p + false_p + false_n)
+
 if __name__ == "__main__":
 
     # Initialize two arrays, one that has true values
@@ -138,6 +129,9 @@ if __name__ == "__main__":
     # Calculate the recall from the above variables
     print('Recall: ', calculate_recall(l1, l2))
 
+    # Calculate the f1 score from the above variables
+    print('F1: ', calculate_f1(l1, l2))
+
 
     # Now let's graph a precision-recall curve. We assume 
     # the below target values and the predicted probability values
@@ -171,8 +165,9 @@ if __name__ == "__main__":
 
     # For every threshold value in the 'thresholds' list, calculate
     # the precision and recall values of the targets and predictions
+    y_p = np.asarray(y_p)
     for i in thresholds:
-        temp_prediction = [1 if x >= i else 0 for x in y_p]
+        temp_prediction = (y_p >= i).astype(np.int8)
         p = calculate_precision(y_t, temp_prediction)
         r = calculate_recall(y_t, temp_prediction)
         precisions.append(p)
@@ -136,15 +136,80 @@ def calculate_fpr(y_true, y_pred):
     true_n = true_negative(y_true, y_pred)
     return false_p / (false_p + true_n)
 
-if __name__ == "__main__":
-    # Empty lists to store TPR and FPR values
-    tpr_list = []
-    fpr_list = []
+def threshold_table(y_true, y_pred, thresholds=None):
+    """
+    Function to calculate TP, FP, TPR and FPR for many thresholds at once.
+    the scores are sorted only one time, and the TP and FP values for every
+    threshold are read from a cumulative sum over the sorted targets
+    :param y_true: list of true values (0 or 1)
+    :param y_pred: list of predicted probabilities
+    :param thresholds: optional list of thresholds. if it is not given,
+                       every distinct predicted value is used as a threshold
+    :return: pandas DataFrame with thresholds, TP, FP, TPR and FPR columns
+    """
+
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+
+    # sort the predictions from the highest to the lowest score.
+    # a sample is predicted as positive for a threshold when its
+    # score is >= the threshold, so after sorting the positives
+    # for any threshold are simply a prefix of the sorted array
+    order = np.argsort(y_pred, kind="mergesort")[::-1]
+    sorted_scores = y_pred[order]
+
+    # the number of true positives among the top i predictions is a
+    # cumulative sum of the targets; everything else in the prefix
+    # is a false positive. we prepend 0 for the empty prefix
+    tps = np.concatenate(([0], np.cumsum(y_true[order] == 1)))
+    fps = np.arange(len(tps)) - tps
+
+    if thresholds is None:
+        # use the last position of every distinct score, so that tied
+        # scores are always counted together, like when binarizing
+        last_of_group = np.flatnonzero(np.diff(sorted_scores))
+        prefix_sizes = np.concatenate((last_of_group, [len(sorted_scores) - 1])) + 1
+        thresholds = sorted_scores[prefix_sizes - 1]
+    else:
+        # find how many scores are >= every threshold. the negated scores
+        # are in ascending order, which is what searchsorted expects
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        prefix_sizes = np.searchsorted(-sorted_scores, -thresholds, side="right")
+
+    tp = tps[prefix_sizes]
+    fp = fps[prefix_sizes]
+
+    # the total number of positives and negatives are the counts
+    # of the full prefix (a threshold where everything is positive)
+    positives = tps[-1]
+    negatives = fps[-1]
 
-    # Empty list to store TP and FP values
-    tp_list = []
-    fp_list = []
+    thresholds_table = pd.DataFrame(data=thresholds, columns=["thresholds"])
+    thresholds_table['TP'] = tp
+    thresholds_table['FP'] = fp
+    thresholds_table['TPR'] = tp / positives
+    thresholds_table['FPR'] = fp / negatives
+    return thresholds_table
+
+def calculate_auc(y_true, y_pred):
+    """
+    Function to calculate the area under the ROC curve. the curve is
+    built with 'threshold_table' from every distinct score, so the
+    whole calculation costs one sort of the predictions
+    :param y_true: list of true values (0 or 1)
+    :param y_pred: list of predicted probabilities
+    :return: calculated AUC
+    """
+    table = threshold_table(y_true, y_pred)
+
+    # the curve starts from (0, 0), where no sample is predicted positive
+    tpr = np.concatenate(([0.0], table.TPR.values))
+    fpr = np.concatenate(([0.0], table.FPR.values))
 
+    # use the trapezoidal rule to get the area under the curve
+    return np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)
+
+if __name__ == "__main__":
     # Target and predicted values
     y_true = [0, 0, 0, 0, 1, 0, 1, 0, 0, 1, 0, 1, 0, 0, 1]
     y_pred = [0.1, 0.3, 0.2, 0.6, 0.8, 0.05, 0.9, 0.5,
@@ -154,18 +219,12 @@ if __name__ == "__main__":
     thresholds = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7,
                   0.8, 0.85, 0.9, 0.99, 1.0]
 
-    # Calculate the TPR and FPR values for all threshold
-    # values, and store the results in 'tpr_list' and 'fpr_list'
-    for thresh in thresholds:
-        temp_pred = [1 if x >= thresh else 0 for x in y_pred]
-        temp_tpr = calculate_tpr(y_true, temp_pred)
-        temp_fpr = calculate_fpr(y_true, temp_pred)
-        temp_tp = true_positive(y_true, temp_pred)
-        temp_fp = false_positive(y_true, temp_pred)
-        tpr_list.append(temp_tpr)
-        fpr_list.append(temp_fpr)
-        tp_list.append(temp_tp)
-        fp_list.append(temp_fp)
+    # Calculate the TP, FP, TPR and FPR values for all threshold
+    # values at once. The predictions are sorted only one time
+    # instead of being binarized again for every threshold
+    thresholds_table = threshold_table(y_true, y_pred, thresholds)
+    tpr_list = thresholds_table.TPR.values
+    fpr_list = thresholds_table.FPR.values
 
     # Plot FPR vs TPR. FPR is on the x-axis and TPR is on the y-axis
     # This curve is known as the Receiver Operating Characteristic (ROC).
@@ -181,20 +240,13 @@ if __name__ == "__main__":
     plt.xlabel('FPR', fontsize=15)
     plt.ylabel('TPR', fontsize=15)
 
-    # Create table that shows the threshold values with their
+    # Print the table that shows the threshold values with their
     # corresponding TP and FP values, to better observe how 
     # changing thresholds affect the TP and FP values
-    tp_list = np.array(tp_list).T
-    fp_list = np.array(fp_list).T
-    tpr_list = np.array(tpr_list).T
-    fpr_list = np.array(fpr_list).T
-    thresholds = np.array(thresholds).T
-    thresholds_table = pd.DataFrame(data=thresholds, columns=["thresholds"])
-    thresholds_table['TP'] = tp_list
-    thresholds_table['FP'] = fp_list
-    thresholds_table['TPR'] = tpr_list
-    thresholds_table['FPR'] = fpr_list
     print(thresholds_table)
+
+    # Calculate the AUC value from the full-resolution ROC curve
+    print('Calculated AUC value = ', calculate_auc(y_true, y_pred))
     
     # Calculate the AUC value using Sklearn
     AUC_values = metrics.roc_auc_score(y_true, y_pred)
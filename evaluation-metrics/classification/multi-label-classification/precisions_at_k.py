@@ -19,6 +19,8 @@ AP@3, we would calculate P@1, P@2, and P@3, add them all, and divide by 3.
 - Mean Average Precision at k (MAP@k): is just an average of AP@k over all samples
 """
 
+import numpy as np
+
 def calculate_pk(y_true, y_pred, k):
     """
     This function calculates precision at k for a singe sample
@@ -88,6 +90,116 @@ def calculate_mapk(y_true, y_pred, k):
     # return mean of apk values list
     return sum(apk_values) / len(apk_values)
 
+def to_padded(y_pred, k=None, pad_value=-1):
+    """
+    This function converts a list of ranked prediction lists into
+    a padded integer matrix, one row per sample
+    :param y_pred: list of lists, predicted classes for every sample
+    :param k: number of columns to keep. default is the longest list
+    :param pad_value: value used to fill the empty positions
+    :return: numpy array of shape (n_samples, k)
+    """
+    if k is None:
+        k = max((len(p) for p in y_pred), default=0)
+    padded = np.full((len(y_pred), k), pad_value, dtype=np.int64)
+    for i, p in enumerate(y_pred):
+        p = p[:k]
+        padded[i, :len(p)] = p
+    return padded
+
+def to_csr(y_true):
+    """
+    This function converts a list of target lists into a CSR-style
+    structure: all classes in one flat array, plus the start position
+    of every sample in that array
+    :param y_true: list of lists, actual classes for every sample
+    :return: tuple of (indptr, indices) numpy arrays
+    """
+    lengths = np.array([len(t) for t in y_true], dtype=np.int64)
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    indices = np.fromiter(
+        (c for t in y_true for c in t), dtype=np.int64, count=indptr[-1])
+    return indptr, indices
+
+def batched_precisions_at_k(pred_matrix, indptr, indices, pad_value=-1):
+    """
+    This function calculates P@k and AP@k for all samples and all
+    k = 1..K at the same time, where K is the number of columns of
+    'pred_matrix'. the results are the same as calling 'calculate_pk'
+    and 'calculate_apk' for every sample and every k
+    :param pred_matrix: padded array of ranked predictions (n_samples, K)
+    :param indptr: start positions of every sample in 'indices' (n_samples + 1)
+    :param indices: flat array with the actual classes of all samples
+    :param pad_value: value used for padding in 'pred_matrix'
+    :return: tuple of (pk, apk), both arrays of shape (n_samples, K)
+    """
+    pred_matrix = np.asarray(pred_matrix, dtype=np.int64)
+    n_samples, k = pred_matrix.shape
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+
+    valid = pred_matrix != pad_value
+    rows = np.arange(n_samples, dtype=np.int64)
+
+    # give every (sample, class) pair a unique integer key, so that
+    # "is this prediction one of the actual classes of its sample"
+    # becomes a single sorted lookup over all the samples at once
+    num_labels = int(max(pred_matrix.max(initial=0), indices.max(initial=0))) + 1
+    true_rows = np.repeat(rows, np.diff(indptr))
+    true_keys = np.unique(true_rows * num_labels + indices)
+    pred_keys = rows[:, None] * num_labels + pred_matrix
+
+    hits = valid & np.isin(pred_keys, true_keys)
+
+    # a class that is predicted twice is only counted once, because
+    # 'calculate_pk' works with sets. keep only the first occurrence
+    if hits.any():
+        flat_keys = np.where(hits, pred_keys, -1).ravel()
+        _, first = np.unique(flat_keys, return_index=True)
+        first_mask = np.zeros(flat_keys.shape, dtype=bool)
+        first_mask[first] = True
+        hits &= first_mask.reshape(hits.shape)
+
+    # the number of correct classes in the top i predictions is a
+    # cumulative sum over the columns. the denominator is the number of
+    # predictions we look at, which is smaller than i for short lists
+    correct = np.cumsum(hits, axis=1)
+    positions = np.arange(1, k + 1)
+    seen = np.minimum(positions[None, :], valid.sum(axis=1)[:, None])
+    pk = np.divide(
+        correct, seen, out=np.zeros((n_samples, k)), where=seen != 0)
+
+    # AP@i is the average of P@1..P@i
+    apk = np.cumsum(pk, axis=1) / positions
+    return pk, apk
+
+def batched_mapk(pred_matrix, indptr, indices, pad_value=-1, batch_size=100_000):
+    """
+    This function calculates MAP@k for every k = 1..K. the samples are
+    processed in batches so that memory stays bounded for large inputs
+    :param pred_matrix: padded array of ranked predictions (n_samples, K)
+    :param indptr: start positions of every sample in 'indices' (n_samples + 1)
+    :param indices: flat array with the actual classes of all samples
+    :param pad_value: value used for padding in 'pred_matrix'
+    :param batch_size: number of samples processed at a time
+    :return: array of length K, where position i - 1 holds MAP@i
+    """
+    n_samples, k = pred_matrix.shape
+    apk_sum = np.zeros(k)
+
+    for start in range(0, n_samples, batch_size):
+        stop = min(start + batch_size, n_samples)
+
+        # slice the CSR structure for this batch of samples
+        batch_indptr = indptr[start:stop + 1] - indptr[start]
+        batch_indices = indices[indptr[start]:indptr[stop]]
+
+        _, apk = batched_precisions_at_k(
+            pred_matrix[start:stop], batch_indptr, batch_indices, pad_value)
+        apk_sum += apk.sum(axis=0)
+
+    return apk_sum / n_samples
+
 if __name__ == "__main__":
 
     # define target values
@@ -125,3 +237,8 @@ if __name__ == "__main__":
     # calculate MAP@k for k = 1, 2, 3, & 4
     for i in range(1, 5):
         print('MAP@{i}: ', calculate_mapk(y_true, y_pred, k=i))
+
+    # calculate MAP@k for k = 1, 2, 3, & 4 in one batched pass
+    mapk_values = batched_mapk(to_padded(y_pred, k=4), *to_csr(y_true))
+    for i in range(1, 5):
+        print(f'Batched MAP@{i}: ', mapk_values[i - 1])
@@ -1,13 +1,55 @@
 # This script shows the implementation of most of the 'error'
 # evaluation metrics used in evaluating regression problems.
 
-# Keep in mind that the implementations of the metrics here are not done in
-# the most efficient way possible. They can be calculated much more efficiently
-# using numpy more. However, looking at the most basic and clear implementation
-# of these metrics makes it much easier to study and understand them.
+# The metrics are calculated with numpy over whole arrays instead of
+# looping over the values one by one. The inputs can be lists, numpy
+# arrays or memory-mapped arrays (np.memmap / np.load(mmap_mode="r")).
+# They are processed in fixed-size chunks, so only one chunk at a time
+# is converted to float64, and the sum of every chunk (which numpy
+# already does with pairwise summation) is added to the total with
+# math.fsum, which keeps the total exact even over billions of rows.
+
+import math
 
 import numpy as np
 
+# number of rows that are processed at a time
+CHUNK_SIZE = 1_000_000
+
+def _chunks(y_true, y_pred, chunk_size=CHUNK_SIZE):
+    """
+    This function yields float64 chunks of the true and predicted values
+    :param y_true: list or array of actual values
+    :param y_pred: list or array of predicted values
+    :param chunk_size: number of rows in every chunk
+    :return: generator of (y_true chunk, y_pred chunk) tuples
+    """
+
+    # np.asarray does not copy numpy or memory-mapped arrays,
+    # so only the current chunk is read and converted
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    for start in range(0, len(y_true), chunk_size):
+        yield (
+            y_true[start:start + chunk_size].astype(np.float64),
+            y_pred[start:start + chunk_size].astype(np.float64),
+        )
+
+def _chunked_mean(y_true, y_pred, error_function, chunk_size=CHUNK_SIZE):
+    """
+    This function calculates the mean of an element-wise error
+    :param y_true: list or array of actual values
+    :param y_pred: list or array of predicted values
+    :param error_function: function that takes two float64 chunks
+                           and returns the element-wise errors
+    :param chunk_size: number of rows in every chunk
+    :return: mean of the errors
+    """
+    partial_sums = [
+        error_function(yt, yp).sum() for yt, yp in _chunks(y_true, y_pred, chunk_size)
+    ]
+    return math.fsum(partial_sums) / len(y_true)
+
 def mean_absolute_error(y_true, y_pred):
     """
     This function calculates the mean absolute error metric
@@ -15,18 +57,8 @@ def mean_absolute_error(y_true, y_pred):
     :param y_pred: list of values, predicted classes
     :return: mean absolute error value
     """
+    return _chunked_mean(y_true, y_pred, lambda yt, yp: np.abs(yt - yp))
 
-    # initialize an error value to 0
-    error = 0
-
-    # iterate through true and predicted values 
-    # and add absolute error to 'error' variable
-    for yt, yp in zip(y_true, y_pred):
-        error += np.abs(yt - yp)
-
-    # return ME
-    return error / len(y_true)    
-        
 def mean_squared_error(y_true, y_pred):
     """
     This function calculates the mean squared error metric
@@ -34,17 +66,7 @@ def mean_squared_error(y_true, y_pred):
     :param y_pred: list of values, predicted classes
     :return: mean squared error value
     """
-
-    # intialize an error value to 0
-    error = 0
-
-    # iterate through true and predicted values 
-    # and add squared error to 'error' variable
-    for yt, yp in zip(y_true, y_pred):
-        error += np.square(yt - yp)
-
-    # return MSE
-    return error / len(y_true)
+    return _chunked_mean(y_true, y_pred, lambda yt, yp: np.square(yt - yp))
 
 def mean_squared_log_error(y_true, y_pred):
     """
@@ -54,16 +76,9 @@ def mean_squared_log_error(y_true, y_pred):
     :return: mean squared log error value
     """
 
-    # intialize an error value to 0
-    error = 0
-
-    # iterate through true and predicted values 
-    # and add squared log error to 'error' variable
-    for yt, yp in zip(y_true, y_pred):
-        error += np.square((np.log(1 + yt) - np.log(1 + yp)))
-
-    # return MSLE
-    return error / len(y_true)
+    # np.log1p(x) is log(1 + x), but more precise for small x
+    return _chunked_mean(
+        y_true, y_pred, lambda yt, yp: np.square(np.log1p(yt) - np.log1p(yp)))
 
 def root_mean_squared_log_error(y_true, y_pred):
     """
@@ -72,17 +87,7 @@ def root_mean_squared_log_error(y_true, y_pred):
     :param y_pred: list of values, predicted classes
     :return: root mean squared log error value
     """
-
-    # intialize an error value to 0
-    error = 0
-
-    # iterate through true and predicted values 
-    # and add root squared log error to 'error' variable
-    for yt, yp in zip(y_true, y_pred):
-        error += (np.log(1 + yt) - np.log(1 + yp))
-
-    # return RMSLE
-    return error / len(y_true)
+    return np.sqrt(mean_squared_log_error(y_true, y_pred))
 
 def mean_percentage_error(y_true, y_pred):
     """
@@ -91,17 +96,7 @@ def mean_percentage_error(y_true, y_pred):
     :param y_pred: list of values, predicted classes
     :return: mean percentage error value
     """
-
-    # intialize an error value to 0
-    error = 0
-
-    # iterate through true and predicted values 
-    # and add mean percentage error error to 'error' variable
-    for yt, yp in zip(y_true, y_pred):
-        error += (yt - yp) / yt
-
-    # return Percentage Error
-    return error / len(y_true)
+    return _chunked_mean(y_true, y_pred, lambda yt, yp: (yt - yp) / yt)
 
 def mean_absolute_percentage_error(y_true, y_pred):
     """
@@ -110,39 +105,98 @@ def mean_absolute_percentage_error(y_true, y_pred):
     :param y_pred: list of values, predicted classes
     :return: mean absolute percentage error value
     """
+    return _chunked_mean(y_true, y_pred, lambda yt, yp: np.abs(yt - yp) / yt)
 
-    # intialize an error value to 0
-    error = 0
-
-    # iterate through true and predicted values 
-    # and add mean absolute percentage error error to 'error' variable
-    for yt, yp in zip(y_true, y_pred):
-        error += np.abs((yt - yp)) / yt
-
-    # return MAPE
-    return error / len(y_true)
+def _update_moments(count, mean, m2, values):
+    """
+    This function adds a chunk to a running count, mean and sum of
+    squared differences from the mean (m2), with Chan's parallel formula
+    :param count: number of values so far
+    :param mean: mean of the values so far
+    :param m2: sum of squared differences from the mean so far
+    :param values: float64 chunk of new values
+    :return: tuple of the new (count, mean, m2)
+    """
+    chunk_count = len(values)
+    if chunk_count == 0:
+        return count, mean, m2
+    chunk_mean = values.mean()
+    chunk_m2 = np.square(values - chunk_mean).sum()
+    delta = chunk_mean - mean
+    total = count + chunk_count
+    m2 += chunk_m2 + delta ** 2 * count * chunk_count / total
+    mean += delta * chunk_count / total
+    return total, mean, m2
+
+def _r_squared_from_sums(squared_error, m2_true):
+    """
+    This function calculates r-squared from the sum of squared errors
+    and the sum of squared differences of y_true from its mean
+    """
+    if m2_true == 0:
+        # constant targets: like sklearn, a perfect prediction scores 1
+        # and anything else 0, instead of dividing by zero
+        return 1.0 if squared_error == 0 else 0.0
+    return 1 - squared_error / m2_true
 
-def r_squared(y_true, y_pred):
+def r_squared(y_true, y_pred, chunk_size=CHUNK_SIZE):
     """
     This function calculates the r-squared metric
     :param y_true: list of values, actual classes
     :param y_pred: list of values, predicted classes
+    :param chunk_size: number of rows in every chunk
     :return: r-squared value
     """
 
-    # initialize all parameters in r-squared formula
-    top = 0
-    bottom = 0
-    y_mean = np.mean(y_true)
+    # r-squared needs the mean of y_true, which we only know at the end.
+    # so we keep a running mean and sum of squared differences from
+    # that mean (m2), next to the sum of squared errors
+    squared = []
+    count, mean_true, m2_true = 0, 0.0, 0.0
+    for yt, yp in _chunks(y_true, y_pred, chunk_size):
+        squared.append(np.square(yt - yp).sum())
+        count, mean_true, m2_true = _update_moments(count, mean_true, m2_true, yt)
 
-    # iterate through true and predicted values 
-    # and update all variables
-    for yt, yp in zip(y_true, y_pred):
-        top += np.square(yt - yp)
-        bottom += np.square((yt - y_mean))
+    if count == 0:
+        raise ValueError("r-squared is not defined for empty arrays")
+    return _r_squared_from_sums(math.fsum(squared), m2_true)
 
-    # return r-squared value
-    return 1 - (top / bottom)
+def regression_report(y_true, y_pred, chunk_size=CHUNK_SIZE):
+    """
+    This function calculates all the error metrics above while
+    reading the data only one time
+    :param y_true: list or array of actual values
+    :param y_pred: list or array of predicted values
+    :param chunk_size: number of rows in every chunk
+    :return: dictionary with metric names and values
+    """
+
+    # partial sums of every chunk, added together with math.fsum at the end
+    absolute, squared, squared_log, percentage, absolute_percentage = [], [], [], [], []
+    count, mean_true, m2_true = 0, 0.0, 0.0
+
+    for yt, yp in _chunks(y_true, y_pred, chunk_size):
+        error = yt - yp
+        absolute.append(np.abs(error).sum())
+        squared.append(np.square(error).sum())
+        squared_log.append(np.square(np.log1p(yt) - np.log1p(yp)).sum())
+        percentage.append((error / yt).sum())
+        absolute_percentage.append((np.abs(error) / yt).sum())
+        count, mean_true, m2_true = _update_moments(count, mean_true, m2_true, yt)
+
+    if count == 0:
+        raise ValueError("The metrics are not defined for empty arrays")
+
+    msle = math.fsum(squared_log) / count
+    return {
+        "mean_absolute_error": math.fsum(absolute) / count,
+        "mean_squared_error": math.fsum(squared) / count,
+        "mean_squared_log_error": msle,
+        "root_mean_squared_log_error": math.sqrt(msle),
+        "mean_percentage_error": math.fsum(percentage) / count,
+        "mean_absolute_percentage_error": math.fsum(absolute_percentage) / count,
+        "r_squared": _r_squared_from_sums(math.fsum(squared), m2_true),
+    }
 
 if __name__ == "__main__":
 
@@ -157,4 +211,9 @@ if __name__ == "__main__":
     print('Calculated Root Mean Squared Log Error = ', root_mean_squared_log_error(y_true, y_pred))
     print('Calculated Mean Percentage Error = ', mean_percentage_error(y_true, y_pred))
     print('Calculated Mean Absolute Percentage Error = ', mean_absolute_percentage_error(y_true, y_pred))
-    print('Calculated R-Squared value = ', r_squared(y_true, y_pred))
\ No newline at end of file
+    print('Calculated R-Squared value = ', r_squared(y_true, y_pred))
+
+    # calculate all the values again, with a single pass over the data
+    print('\nAll metrics in one pass:')
+    for name, value in regression_report(y_true, y_pred).items():
+        print(f'\t{name} = {value}')
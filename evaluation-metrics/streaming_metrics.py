@@ -0,0 +1,270 @@
+# This script shows how evaluation metrics can be calculated in a
+# streaming way, without having all of 'y_true' and 'y_pred' in memory.
+
+# Every metric that we have implemented so far is a function of a few
+# sums over the samples (counts of the confusion matrix, sum of absolute
+# errors, sum of squared errors, ...). So instead of storing the values
+# themselves, we only keep those sums in an 'accumulator' object:
+
+#   - update(y_true, y_pred): add a new batch (chunk) of samples
+#   - merge(other): add the sums of another accumulator, for example
+#     one that was filled by a different process on a different file
+#   - result(): calculate the metrics from the sums
+
+# This way predictions can be scored chunk by chunk from a csv file
+# or a generator, and the memory usage does not depend on the number of rows.
+
+import numpy as np
+import pandas as pd
+from sklearn import metrics
+
+
+def _safe_divide(numerator, denominator):
+    """
+    Divide two arrays and return 0 wherever the denominator is 0.
+    this is the same convention that sklearn uses for ill-defined metrics
+    :param numerator: numpy array or value
+    :param denominator: numpy array or value
+    :return: numpy array with the results
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+
+class ConfusionAccumulator:
+    """
+    Accumulates a confusion matrix for classification problems.
+    rows of the matrix are actual classes and columns are predicted classes,
+    same as sklearn.metrics.confusion_matrix
+    """
+
+    def __init__(self, num_classes):
+        """
+        :param num_classes: number of classes; labels must be 0..num_classes-1
+        """
+        self.num_classes = num_classes
+        self.matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    def update(self, y_true, y_pred):
+        """
+        Add a batch of targets and predictions to the confusion matrix
+        :param y_true: list or array of true classes
+        :param y_pred: list or array of predicted classes
+        :return: self, so that calls can be chained
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+
+        # a label outside 0..num_classes-1 would be counted in a wrong cell
+        for name, labels in (("y_true", y_true), ("y_pred", y_pred)):
+            if labels.size and (labels.min() < 0 or labels.max() >= self.num_classes):
+                raise ValueError(f"{name} has labels outside 0..{self.num_classes - 1}")
+
+        # every (actual, predicted) pair gets its own cell index,
+        # so one bincount fills the whole matrix for this batch
+        codes = y_true * self.num_classes + y_pred
+        counts = np.bincount(codes, minlength=self.num_classes ** 2)
+        self.matrix += counts.reshape(self.num_classes, self.num_classes)
+        return self
+
+    def merge(self, other):
+        """
+        Add the counts of another accumulator to this one
+        :param other: ConfusionAccumulator with the same number of classes
+        :return: self
+        """
+        if other.num_classes != self.num_classes:
+            raise ValueError("Cannot merge accumulators with a different number of classes")
+        self.matrix += other.matrix
+        return self
+
+    def result(self):
+        """
+        Calculate classification metrics from the accumulated counts
+        :return: dictionary with metric names and values
+        """
+        tp = np.diag(self.matrix).astype(np.float64)
+
+        # column sums are the number of predictions for every class,
+        # row sums are the number of actual samples in every class
+        predicted = self.matrix.sum(axis=0)
+        actual = self.matrix.sum(axis=1)
+        total = actual.sum()
+
+        precision = _safe_divide(tp, predicted)
+        recall = _safe_divide(tp, actual)
+        f1 = _safe_divide(2 * tp, predicted + actual)
+
+        results = {
+            "accuracy": float(_safe_divide(tp.sum(), total)),
+            "macro_precision": float(precision.mean()),
+            "macro_recall": float(recall.mean()),
+            "macro_f1": float(f1.mean()),
+            "micro_precision": float(_safe_divide(tp.sum(), predicted.sum())),
+            "micro_recall": float(_safe_divide(tp.sum(), actual.sum())),
+            "weighted_precision": float(_safe_divide((precision * actual).sum(), total)),
+            "weighted_recall": float(_safe_divide((recall * actual).sum(), total)),
+            "weighted_f1": float(_safe_divide((f1 * actual).sum(), total)),
+        }
+
+        # for binary problems also report the metrics of the positive class
+        if self.num_classes == 2:
+            results["precision"] = float(precision[1])
+            results["recall"] = float(recall[1])
+            results["f1"] = float(f1[1])
+
+        return results
+
+
+class RegressionAccumulator:
+    """
+    Accumulates the sums needed for the regression error metrics
+    and for R-squared
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum_absolute_error = 0.0
+        self.sum_squared_error = 0.0
+        self.sum_squared_log_error = 0.0
+        self.sum_percentage_error = 0.0
+        self.sum_absolute_percentage_error = 0.0
+
+        # mean of y_true and the sum of squared differences from
+        # that mean. these are merged with the parallel algorithm
+        # of Chan et al., which is much more stable than keeping
+        # the sum of y_true and the sum of y_true squared
+        self.mean_true = 0.0
+        self.m2_true = 0.0
+
+    def update(self, y_true, y_pred):
+        """
+        Add a batch of targets and predictions
+        :param y_true: list or array of actual values
+        :param y_pred: list or array of predicted values
+        :return: self, so that calls can be chained
+        """
+        y_true = np.asarray(y_true, dtype=np.float64)
+        y_pred = np.asarray(y_pred, dtype=np.float64)
+        if len(y_true) == 0:
+            return self
+
+        error = y_true - y_pred
+        batch = RegressionAccumulator()
+        batch.count = len(y_true)
+        batch.sum_absolute_error = np.abs(error).sum()
+        batch.sum_squared_error = np.square(error).sum()
+        batch.sum_squared_log_error = np.square(np.log1p(y_true) - np.log1p(y_pred)).sum()
+        batch.sum_percentage_error = (error / y_true).sum()
+        batch.sum_absolute_percentage_error = np.abs(error / y_true).sum()
+        batch.mean_true = y_true.mean()
+        batch.m2_true = np.square(y_true - batch.mean_true).sum()
+
+        # a batch is just a small accumulator, so adding
+        # it is the same operation as merging two workers
+        return self.merge(batch)
+
+    def merge(self, other):
+        """
+        Add the sums of another accumulator to this one
+        :param other: RegressionAccumulator
+        :return: self
+        """
+        if other.count == 0:
+            return self
+
+        count = self.count + other.count
+        delta = other.mean_true - self.mean_true
+        self.m2_true += other.m2_true + delta ** 2 * self.count * other.count / count
+        self.mean_true += delta * other.count / count
+        self.count = count
+
+        self.sum_absolute_error += other.sum_absolute_error
+        self.sum_squared_error += other.sum_squared_error
+        self.sum_squared_log_error += other.sum_squared_log_error
+        self.sum_percentage_error += other.sum_percentage_error
+        self.sum_absolute_percentage_error += other.sum_absolute_percentage_error
+        return self
+
+    def result(self):
+        """
+        Calculate regression metrics from the accumulated sums
+        :return: dictionary with metric names and values
+        """
+        n = self.count
+        if n == 0:
+            raise ValueError("The metrics are not defined for empty arrays")
+
+        # constant targets: like sklearn (and 'regression_report'), a
+        # perfect prediction scores 1 and anything else 0
+        if self.m2_true == 0:
+            r_squared = 1.0 if self.sum_squared_error == 0 else 0.0
+        else:
+            r_squared = 1 - self.sum_squared_error / self.m2_true
+
+        msle = self.sum_squared_log_error / n
+        return {
+            "mean_absolute_error": self.sum_absolute_error / n,
+            "mean_squared_error": self.sum_squared_error / n,
+            "mean_squared_log_error": msle,
+            "root_mean_squared_log_error": np.sqrt(msle),
+            "mean_percentage_error": self.sum_percentage_error / n,
+            "mean_absolute_percentage_error": self.sum_absolute_percentage_error / n,
+            "r_squared": r_squared,
+        }
+
+
+def score_csv(path, accumulator, true_column, pred_column, chunksize=1_000_000):
+    """
+    Stream a csv file chunk by chunk into an accumulator
+    :param path: path of the csv file
+    :param accumulator: ConfusionAccumulator or RegressionAccumulator
+    :param true_column: name of the column with the actual values
+    :param pred_column: name of the column with the predicted values
+    :param chunksize: number of rows read at a time
+    :return: the accumulator
+    """
+    for chunk in pd.read_csv(path, usecols=[true_column, pred_column], chunksize=chunksize):
+        accumulator.update(chunk[true_column].values, chunk[pred_column].values)
+    return accumulator
+
+
+if __name__ == "__main__":
+
+    y_true = [0, 1, 2, 0, 1, 2, 0, 2, 2]
+    y_pred = [0, 2, 1, 0, 2, 1, 0, 0, 2]
+
+    # pretend that the data comes from two different workers,
+    # each one scoring its own chunks, and merge the results
+    worker_1 = ConfusionAccumulator(num_classes=3)
+    worker_2 = ConfusionAccumulator(num_classes=3)
+    worker_1.update(y_true[:3], y_pred[:3]).update(y_true[3:6], y_pred[3:6])
+    worker_2.update(y_true[6:], y_pred[6:])
+    classification = worker_1.merge(worker_2).result()
+
+    print('Streaming accuracy: ', classification["accuracy"])
+    print('Sklearn accuracy: ', metrics.accuracy_score(y_true, y_pred))
+    print('Streaming macro precision: ', classification["macro_precision"])
+    print('Sklearn macro precision: ', metrics.precision_score(
+        y_true, y_pred, average="macro"))
+    print('Streaming weighted recall: ', classification["weighted_recall"])
+    print('Sklearn weighted recall: ', metrics.recall_score(
+        y_true, y_pred, average="weighted"), '\n')
+
+    # regression values, scored in batches of 2
+    y_true = [3.0, 0.5, 2.0, 7.0, 4.2, 1.1]
+    y_pred = [2.5, 0.4, 2.1, 7.8, 3.9, 1.0]
+
+    regression = RegressionAccumulator()
+    for i in range(0, len(y_true), 2):
+        regression.update(y_true[i:i + 2], y_pred[i:i + 2])
+    regression = regression.result()
+
+    print('Streaming MSE: ', regression["mean_squared_error"])
+    print('Sklearn MSE: ', metrics.mean_squared_error(y_true, y_pred))
+    print('Streaming MSLE: ', regression["mean_squared_log_error"])
+    print('Sklearn MSLE: ', metrics.mean_squared_log_error(y_true, y_pred))
+    print('Streaming R2: ', regression["r_squared"])
+    print('Sklearn R2: ', metrics.r2_score(y_true, y_pred))
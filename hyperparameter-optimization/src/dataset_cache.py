@@ -0,0 +1,407 @@
+# This script is a small cache for the csv files that we train on.
+
+# This file is copied into every folder that uses it, and the copies must
+# stay identical. Edit the copy in 'arranging-machine-learning-projects/src'
+# and run 'python check_shared_modules.py --sync' at the root of the repo.
+
+# Parsing text is the slowest part of reading a csv file, and we read the
+# same files again and again while experimenting. So the first time a csv
+# file is read, every column is saved as a typed numpy (.npy) file in a
+# '<file>.cache' folder next to it. Text columns are dictionary-encoded:
+# we save the list of distinct values once and an integer code per row.
+
+# The next reads load the .npy files with memory mapping, which does not
+# parse or copy anything. The cache is rebuilt when the csv file changes:
+# if its size or modification time changed and its content hash differs
+# from the one that was saved with the cache. It is also rebuilt when it is
+# read with other pd.read_csv arguments (usecols, dtype, ...) than the ones
+# it was built with, because they change the columns and their values.
+
+# Usage: replace 'pd.read_csv(path)' with 'dataset_cache.read_csv(path)'
+
+# Numeric columns are saved with the smallest type that holds all their
+# values exactly: for example MNIST pixels (0-255) are saved as uint8
+# instead of int64, and the label and fold columns as uint8 or int8.
+# Float columns are saved as float32 when no value changes. This uses
+# 8 times less memory for pixel data, and faster reads of the columns.
+# 'dtype_report' shows the saved bytes of every column. The small types are
+# used by 'load_columns' and 'load_matrix' (the arrays of train.py), while
+# 'read_csv' gives back the types of pd.read_csv, unless downcast=True.
+
+# Numeric columns can also be saved together as one 2D block with
+# 'load_matrix', so that rows of features can be gathered directly
+# from the memory-mapped file without building a DataFrame first.
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# bump this when the format of the cache changes
+CACHE_VERSION = 2
+
+
+def cache_dir(path):
+    """
+    :param path: path of the csv file
+    :return: path of the cache folder of the csv file
+    """
+    return path + ".cache"
+
+
+def _file_hash(path, block_size=1 << 24):
+    """
+    Calculate the sha1 hash of a file, reading it in blocks
+    :param path: path of the file
+    :param block_size: number of bytes read at a time
+    :return: hex digest
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _kwargs_hash(read_csv_kwargs):
+    """
+    Calculate a hash of the pd.read_csv arguments of a cache
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: hex digest
+    """
+    # values that are not json (like numpy types) are hashed by their repr.
+    # functions (for example 'converters') have a different repr in every
+    # process, so a cache built with them is rebuilt every time
+    text = json.dumps(read_csv_kwargs, sort_keys=True, default=repr)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _is_valid(path, meta, read_csv_kwargs):
+    """
+    Check if the cache still matches the csv file
+    :param path: path of the csv file
+    :param meta: metadata saved with the cache
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: True if the cache can be used
+    """
+    if meta.get("version") != CACHE_VERSION:
+        return False
+    if meta.get("read_csv_hash") != _kwargs_hash(read_csv_kwargs):
+        return False
+    stat = os.stat(path)
+    if stat.st_size != meta["source_size"]:
+        return False
+    if stat.st_mtime_ns == meta["source_mtime_ns"]:
+        return True
+
+    # the file was touched or copied, but may still have the same content
+    return _file_hash(path) == meta["source_hash"]
+
+
+def _codes_dtype(num_categories):
+    """
+    :param num_categories: number of distinct values of a column
+    :return: smallest signed integer type for the codes (-1 is missing)
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _downcast(values):
+    """
+    Convert a numeric array to the smallest type that holds its values
+    exactly: unsigned or signed integers, or float32 for floats
+    :param values: numpy array
+    :return: numpy array, the same one if it cannot be made smaller
+    """
+    if values.size == 0:
+        return values
+
+    if values.dtype.kind in "iu":
+        low, high = values.min(), values.max()
+        candidates = (np.uint8, np.uint16, np.uint32) if low >= 0 else (np.int8, np.int16, np.int32)
+        for dtype in candidates:
+            if np.dtype(dtype).itemsize >= values.dtype.itemsize:
+                break
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return values.astype(dtype)
+        return values
+
+    if values.dtype.kind == "f" and values.dtype.itemsize > 4:
+        # only if every value (missing ones included) stays the same.
+        # values that are too large for float32 become inf and fail the check
+        with np.errstate(over="ignore"):
+            small = values.astype(np.float32)
+        if np.array_equal(small, values, equal_nan=True):
+            return small
+    return values
+
+
+def _temp_dir(path, suffix):
+    """
+    Create a new folder with a unique name next to a csv file
+    :param path: path of the csv file
+    :param suffix: end of the folder name
+    :return: path of the folder
+    """
+    return tempfile.mkdtemp(
+        prefix=os.path.basename(path) + ".", suffix=suffix, dir=os.path.dirname(path) or ".")
+
+
+def _read_meta(path, read_csv_kwargs):
+    """
+    Read the metadata of the cache of a csv file
+    :param path: path of the csv file
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: metadata, or None if there is no valid cache
+    """
+    meta_path = os.path.join(cache_dir(path), "meta.json")
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return meta if _is_valid(path, meta, read_csv_kwargs) else None
+
+
+def build_cache(path, **read_csv_kwargs):
+    """
+    Read a csv file with pandas and save it as a cache
+    :param path: path of the csv file
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: metadata of the cache
+    """
+    stat = os.stat(path)
+    df = pd.read_csv(path, **read_csv_kwargs)
+
+    # write everything into a temporary folder first and move it in place
+    # at the end, so that an interrupted write never leaves a broken cache.
+    # the name ends with '.cache' so that it is ignored like the cache
+    target = cache_dir(path)
+    tmp = _temp_dir(path, ".tmp.cache")
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        column = {"name": name, "file": f"col_{i}.npy"}
+        values = df[name]
+
+        if values.dtype.kind in "biuf":
+            column["kind"] = "numeric"
+            column["source_dtype"] = values.dtype.str
+            values = _downcast(values.to_numpy())
+            column["dtype"] = values.dtype.str
+            np.save(os.path.join(tmp, column["file"]), values)
+        else:
+            # dictionary-encode text columns. missing values get code -1
+            codes, categories = pd.factorize(values, sort=True)
+            column["kind"] = "categorical"
+            column["categories"] = categories.tolist()
+            np.save(
+                os.path.join(tmp, column["file"]),
+                codes.astype(_codes_dtype(len(categories))))
+        columns.append(column)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_hash": _file_hash(path),
+        "read_csv_hash": _kwargs_hash(read_csv_kwargs),
+        "n_rows": len(df),
+        "columns": columns,
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # other processes may build the same cache at the same time (like the
+    # workers of 'cv_runner.py'). if one of them was faster and its cache
+    # is valid, our copy is dropped and theirs is used. an old cache is
+    # moved out of the way first, so it is never half-deleted in place
+    for _ in range(3):
+        try:
+            os.replace(tmp, target)
+            return meta
+        except OSError:
+            existing = _read_meta(path, read_csv_kwargs)
+            if existing is not None:
+                shutil.rmtree(tmp, ignore_errors=True)
+                return existing
+            old = _temp_dir(path, ".old.cache")
+            try:
+                os.replace(target, os.path.join(old, "cache"))
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(old, ignore_errors=True)
+
+    os.replace(tmp, target)
+    return meta
+
+
+def dtype_report(path, **read_csv_kwargs):
+    """
+    Show how much memory the cache saves for every numeric column,
+    compared to the types that pandas uses when reading the csv file
+    :param path: path of the csv file
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: pandas DataFrame with one row per numeric column
+    """
+    meta = load_meta(path, **read_csv_kwargs)
+    rows = []
+    for column in meta["columns"]:
+        if column["kind"] != "numeric":
+            continue
+        source_bytes = meta["n_rows"] * np.dtype(column["source_dtype"]).itemsize
+        cache_bytes = meta["n_rows"] * np.dtype(column["dtype"]).itemsize
+        rows.append({
+            "column": column["name"],
+            "source_dtype": np.dtype(column["source_dtype"]).name,
+            "dtype": np.dtype(column["dtype"]).name,
+            "source_bytes": source_bytes,
+            "bytes": cache_bytes,
+            "saved_bytes": source_bytes - cache_bytes,
+        })
+    return pd.DataFrame(rows)
+
+
+def load_meta(path, **read_csv_kwargs):
+    """
+    Get the metadata of the cache of a csv file, building the cache if
+    it does not exist yet or if it does not match the csv file anymore
+    :param path: path of the csv file
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: metadata of the cache
+    """
+    meta = _read_meta(path, read_csv_kwargs)
+    if meta is not None:
+        return meta
+    return build_cache(path, **read_csv_kwargs)
+
+
+def load_columns(path, columns=None, **read_csv_kwargs):
+    """
+    Load columns of a csv file from its cache without copying them.
+    numeric columns are read-only memory-mapped numpy arrays, and
+    text columns are (codes, categories) tuples
+    :param path: path of the csv file
+    :param columns: optional list of columns to load, default is all
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: dictionary of column name: values
+    """
+    meta = load_meta(path, **read_csv_kwargs)
+    folder = cache_dir(path)
+
+    loaded = {}
+    for column in meta["columns"]:
+        if columns is not None and column["name"] not in columns:
+            continue
+        values = np.load(os.path.join(folder, column["file"]), mmap_mode="r")
+        if column["kind"] == "categorical":
+            values = (values, column["categories"])
+        loaded[column["name"]] = values
+    return loaded
+
+
+def read_csv(path, columns=None, as_category=False, downcast=False, **read_csv_kwargs):
+    """
+    Drop-in replacement of pd.read_csv that reads from the cache
+    :param path: path of the csv file
+    :param columns: optional list of columns to load, default is all
+    :param as_category: if True, text columns are returned as pandas
+                        categoricals, which skips decoding them to strings
+    :param downcast: if True, numeric columns keep the small types of the
+                     cache. by default they get the types that pd.read_csv
+                     gives, so that arithmetic on them cannot overflow
+    :param read_csv_kwargs: extra arguments for pd.read_csv, only used
+                            when the cache is built
+    :return: pandas DataFrame
+    """
+    source_dtypes = {
+        column["name"]: column.get("source_dtype")
+        for column in load_meta(path, **read_csv_kwargs)["columns"]
+    }
+
+    data = {}
+    for name, values in load_columns(path, columns, **read_csv_kwargs).items():
+        if isinstance(values, tuple):
+            codes, categories = values
+            values = pd.Categorical.from_codes(np.asarray(codes), categories=categories)
+            if not as_category:
+                values = np.asarray(values, dtype=object)
+        elif not downcast:
+            values = values.astype(source_dtypes[name])
+        data[name] = np.asarray(values) if isinstance(values, np.memmap) else values
+
+    # copy=False avoids one more copy of the arrays here, but the DataFrame
+    # is not zero-copy: the numeric columns were already converted with
+    # astype (unless downcast=True), and pandas consolidates columns of the
+    # same type into one 2D block, which copies them (older versions of
+    # pandas do that right away, newer ones at the first operation)
+    return pd.DataFrame(data, copy=False)
+
+
+def load_matrix(path, columns, dtype=None, **read_csv_kwargs):
+    """
+    Load numeric columns of a csv file as one memory-mapped 2D block,
+    with one row per sample. the block is saved in the cache folder the
+    first time, so it is also rebuilt when the csv file changes
+    :param path: path of the csv file
+    :param columns: list of numeric columns, in the order of the block
+    :param dtype: optional numpy type of the block. default is the
+                  common type of the columns
+    :param read_csv_kwargs: extra arguments for pd.read_csv
+    :return: read-only memory-mapped numpy array (n_rows, len(columns))
+    """
+    meta = load_meta(path, **read_csv_kwargs)
+    loaded = load_columns(path, columns, **read_csv_kwargs)
+    if any(isinstance(loaded[name], tuple) for name in columns):
+        raise ValueError("Only numeric columns can be loaded as a matrix")
+
+    if dtype is None:
+        dtype = np.result_type(*[loaded[name].dtype for name in columns])
+    dtype = np.dtype(dtype)
+
+    # the name of the block depends on the columns and on the type
+    key = hashlib.sha1(json.dumps([list(columns), dtype.str]).encode()).hexdigest()
+    block_path = os.path.join(cache_dir(path), f"matrix_{key}.npy")
+
+    if not os.path.exists(block_path):
+        # a unique temporary file, so that two processes that write the
+        # same block never truncate each other's file
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f"matrix_{key}.", suffix=".tmp.npy", dir=cache_dir(path))
+        os.close(fd)
+        block = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=dtype, shape=(meta["n_rows"], len(columns)))
+
+        # fill the block a chunk of rows at a time, so that
+        # the columns are read in order and memory stays bounded
+        chunk_size = 65536
+        for start in range(0, meta["n_rows"], chunk_size):
+            stop = start + chunk_size
+            for j, name in enumerate(columns):
+                block[start:stop, j] = loaded[name][start:stop]
+        block.flush()
+        del block
+        os.replace(tmp_path, block_path)
+
+    return np.load(block_path, mmap_mode="r")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # show the saved memory of a csv file, for example:
+    #   python dataset_cache.py ../input/mnist_train_folds.csv
+    report = dtype_report(sys.argv[1])
+    print(report.to_string(index=False))
+    print(
+        f"Total: {report.source_bytes.sum():,} bytes -> {report.bytes.sum():,} bytes "
+        f"({report.saved_bytes.sum():,} bytes saved)"
+    )
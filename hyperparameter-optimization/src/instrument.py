@@ -0,0 +1,162 @@
+# This script measures how long every stage of a training script takes.
+
+# This file is copied into every folder that uses it, and the copies must
+# stay identical. Edit the copy in 'arranging-machine-learning-projects/src'
+# and run 'python check_shared_modules.py --sync' at the root of the repo.
+
+# For every stage (reading the csv, splitting the folds, fitting,
+# predicting, ...) it records the wall time, the CPU time and the memory
+# (RSS) of the process, and appends them as one JSON line to a file.
+# Every line also has the script name, a run id and extra fields like
+# the fold, so runs can be compared with each other over time.
+
+# Instrumentation is off by default. To turn it on, set the environment
+# variable AAMLP_PROFILE to the path of the output file, for example:
+#   AAMLP_PROFILE=../profile.jsonl python train.py --model rf
+# When it is off, 'stage' does nothing, so it can stay in the code.
+
+# Memory fields of every stage:
+#   rss_start_bytes, rss_end_bytes, rss_delta_bytes: resident memory
+#     at the start and at the end of the stage, and the difference
+#   stage_peak_rss_bytes: highest resident memory during the stage. on
+#     linux the peak of the process is reset at the start of every stage
+#     (by writing "5" to /proc/self/clear_refs). it is None where that is
+#     not possible. stages should not be nested, since an inner stage
+#     resets the peak of the outer one
+#   process_max_rss_bytes: highest resident memory since the process
+#     started (forked workers start with the value of their parent)
+
+import os
+import sys
+import json
+import time
+import uuid
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    # the 'resource' module does not exist on windows
+    resource = None
+
+# every process that is started from the same run shares this id
+RUN_ID = os.environ.setdefault("AAMLP_RUN_ID", uuid.uuid4().hex[:12])
+
+
+# highest stage peak of this process. resetting the peak on linux also
+# resets ru_maxrss, so the highest value is kept here as well
+_max_stage_peak = 0
+
+
+def process_max_rss_bytes():
+    """
+    :return: highest resident memory since the process started, in bytes, or None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes, macOS reports bytes
+    peak = peak if sys.platform == "darwin" else peak * 1024
+    return max(peak, _max_stage_peak)
+
+
+def _proc_status_bytes(field):
+    """
+    Read a memory field like "VmRSS" or "VmHWM" from /proc/self/status
+    :return: value in bytes, or None if it is not available
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_bytes():
+    """
+    :return: current resident memory of this process in bytes, or None
+    """
+    return _proc_status_bytes("VmRSS")
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident memory (VmHWM) of this process to its current value
+    :return: True if the peak was reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class Profiler:
+    """
+    Records the stages of one script run (or one fold)
+    """
+
+    def __init__(self, script, output=None, **fields):
+        """
+        :param script: name of the script
+        :param output: path of the JSON lines file. default is the
+                       AAMLP_PROFILE environment variable; if neither
+                       is set, nothing is recorded
+        :param fields: extra fields written with every stage, like fold=0
+        """
+        self.script = script
+        self.output = output or os.environ.get("AAMLP_PROFILE")
+        self.fields = fields
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measure the code inside a 'with' block
+        :param name: name of the stage
+        """
+        if not self.output:
+            yield
+            return
+
+        # keep the peak so far before it is reset
+        global _max_stage_peak
+        _max_stage_peak = process_max_rss_bytes() or 0
+
+        rss_start = rss_bytes()
+        peak_was_reset = reset_peak_rss()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            rss_end = rss_bytes()
+            stage_peak = _proc_status_bytes("VmHWM") if peak_was_reset else None
+            _max_stage_peak = max(_max_stage_peak, stage_peak or 0)
+
+            record = {
+                "run_id": RUN_ID,
+                "script": self.script,
+                "stage": name,
+                "wall_seconds": wall_seconds,
+                "cpu_seconds": cpu_seconds,
+                "rss_start_bytes": rss_start,
+                "rss_end_bytes": rss_end,
+                "rss_delta_bytes": None if rss_start is None or rss_end is None else rss_end - rss_start,
+                "stage_peak_rss_bytes": stage_peak,
+                "process_max_rss_bytes": process_max_rss_bytes(),
+                "pid": os.getpid(),
+                "timestamp": time.time(),
+                **self.fields,
+            }
+
+            # one short write in append mode per line, so that
+            # parallel folds can write to the same file
+            with open(self.output, "a") as f:
+                f.write(json.dumps(record) + "\n")
@@ -13,15 +13,22 @@ import numpy as np
 from sklearn import ensemble
 from sklearn import model_selection
 
+import instrument
+
 if __name__ == "__main__":
-    # read the training data
-    df = pd.read_csv("../input/mobile_train.csv")
 
-    # features are all columns without price_range;
-    # note that there is no id column in this dataset;
-    # here we have training features
-    X = df.drop("price_range", axis=1).values
-    y = df.price_range.values
+    # measure every stage when AAMLP_PROFILE is set
+    profiler = instrument.Profiler("randomized_search")
+
+    with profiler.stage("load"):
+        # read the training data
+        df = pd.read_csv("../input/mobile_train.csv")
+
+        # features are all columns without price_range;
+        # note that there is no id column in this dataset;
+        # here we have training features
+        X = df.drop("price_range", axis=1).values
+        y = df.price_range.values
 
     # define the model here; here, we use n_jobs=-1,
     # which means that all cores are used
@@ -53,8 +60,9 @@ if __name__ == "__main__":
         cv=5
     )
 
-    # fit the model and extract best score
-    model.fit(X, y)
+    with profiler.stage("search"):
+        # fit the model and extract best score
+        model.fit(X, y)
     print(f"Best score: {model.best_score_}")
 
     print("Best parameters set:")
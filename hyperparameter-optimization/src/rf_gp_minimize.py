@@ -15,6 +15,8 @@ from sklearn import model_selection
 from skopt import gp_minimize
 from skopt import space
 
+import instrument
+
 def optimize(params, param_names, x, y):
     """
     The main optimization function.
@@ -70,13 +72,17 @@ def optimize(params, param_names, x, y):
 
 if __name__ == "__main__":
 
-    # read the training data
-    df = pd.read_csv("../input/mobile_train.csv")
+    # measure every stage when AAMLP_PROFILE is set
+    profiler = instrument.Profiler("rf_gp_minimize")
+
+    with profiler.stage("load"):
+        # read the training data
+        df = pd.read_csv("../input/mobile_train.csv")
 
-    # features are all columns without price_range;
-    # here we have training features
-    X = df.drop("price_range", axis=1).values
-    y = df.price_range.values
+        # features are all columns without price_range;
+        # here we have training features
+        X = df.drop("price_range", axis=1).values
+        y = df.price_range.values
 
     # define a parameter space
     param_space = [
@@ -115,17 +121,18 @@ if __name__ == "__main__":
         y=y
     )
 
-    # now we call gp_minimize from scikit-optimize; gp_minimize
-    # uses bayesian optimization for minimization of the optimization
-    # function. we need a space of parameters, the function itself,
-    # and the number of calls/iterations we want to have
-    result = gp_minimize(
-        optimization_function,
-        dimensions=param_space,
-        n_calls=15,
-        n_random_starts=10,
-        verbose=10
-    )
+    with profiler.stage("search"):
+        # now we call gp_minimize from scikit-optimize; gp_minimize
+        # uses bayesian optimization for minimization of the optimization
+        # function. we need a space of parameters, the function itself,
+        # and the number of calls/iterations we want to have
+        result = gp_minimize(
+            optimization_function,
+            dimensions=param_space,
+            n_calls=15,
+            n_random_starts=10,
+            verbose=10
+        )
 
     # create best params dict and print it
     best_params = dict(
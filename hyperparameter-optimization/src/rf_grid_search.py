@@ -7,20 +7,26 @@
 # "criterion": ["gini", "entropy"]
 ###############################
 
-import pandas as pd
+import dataset_cache
+import instrument
 
 from sklearn import ensemble
 from sklearn import model_selection
 
 if __name__ == "__main__":
-    # read the training data
-    df = pd.read_csv("../input/mobile_train.csv")
 
-    # features are all columns without price_range;
-    # note that there is no id column in this dataset;
-    # here we have training features
-    X = df.drop("price_range", axis=1).values
-    y = df.price_range.values
+    # measure every stage when AAMLP_PROFILE is set
+    profiler = instrument.Profiler("rf_grid_search")
+
+    with profiler.stage("load"):
+        # read the training data
+        df = dataset_cache.read_csv("../input/mobile_train.csv")
+
+        # features are all columns without price_range;
+        # note that there is no id column in this dataset;
+        # here we have training features
+        X = df.drop("price_range", axis=1).values
+        y = df.price_range.values
 
     # define the model here; here, we use n_jobs=-1,
     # which means that all cores are used
@@ -48,8 +54,9 @@ if __name__ == "__main__":
         cv=5
     )
 
-    # fit the model and extract best score
-    model.fit(X, y)
+    with profiler.stage("search"):
+        # fit the model and extract best score
+        model.fit(X, y)
     print(f"Best score: {model.best_score_}")
 
     print("Best parameters set:")